@@ -0,0 +1,174 @@
+from abc import ABC, abstractmethod
+from table_renderer import TableRenderer
+
+# Exponentially weighted mean and variance. Updates use the residual clipped
+# to the alert threshold, so a single outlier cannot drag the baseline along
+# with it while a genuine level change is still followed within a few steps.
+class RollingStatistic:
+    __slots__ = ('count', 'mean', 'variance', 'weight')
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.variance = 0.0
+        self.weight = 0.0
+
+    def score(self, value, floor):
+        # weight undoes the bias of a variance that started at zero
+        variance = self.variance / self.weight if self.weight else 0.0
+        scale = max(variance ** 0.5, floor, 1e-9)
+        return (value - self.mean) / scale, scale
+
+    def update(self, value, alpha, limit):
+        if self.count == 0:
+            self.mean = value
+        else:
+            residual = max(-limit, min(limit, value - self.mean))
+            self.mean += alpha * residual
+            self.variance = (1 - alpha) * (self.variance + alpha * residual * residual)
+            self.weight = (1 - alpha) * self.weight + alpha
+        self.count += 1
+
+class DailyQuantity(RollingStatistic):
+    __slots__ = ('day', 'quantity', 'branch_id', 'product_id')
+
+    def __init__(self, branch_id, product_id):
+        super().__init__()
+        self.day = None
+        self.quantity = 0
+        self.branch_id = branch_id
+        self.product_id = product_id
+
+# Checks sales in time order against rolling per-(branch, product) baselines
+# for item price and daily quantity. State is a fixed handful of numbers per
+# key, and each sale costs two dictionary lookups and a few float operations.
+class SalesAnomalyDetector:
+    def __init__(self, alpha=0.1, threshold=4.0, warmup=7, min_relative_scale=0.01):
+        self.alpha = alpha
+        self.threshold = threshold
+        self.warmup = warmup
+        self.min_relative_scale = min_relative_scale
+        self.reset()
+
+    def reset(self):
+        self._prices = {}
+        self._quantities = {}
+        # Open daily counts grouped by day, so closing finished days only
+        # touches the keys that sold on them
+        self._open_days = {}
+        self.latest_day = None
+        self.anomalies = []
+
+    # Observer hook for Database ingest notifications
+    def update(self, data):
+        if data.get('full_reload'):
+            self.reset()
+        start = len(self.anomalies)
+        self.process_sales(data['sales'])
+        self.flush()
+        return self.anomalies[start:]
+
+    def process_sales(self, sales):
+        start = len(self.anomalies)
+        for sale in sales:
+            self.process(sale)
+        return self.anomalies[start:]
+
+    def process(self, sale):
+        if sale.product is None:
+            return
+        key = (sale.branch_id, sale.product.product_id)
+
+        price = self._prices.get(key)
+        if price is None:
+            price = self._prices[key] = RollingStatistic()
+        floor = abs(price.mean) * self.min_relative_scale
+        self._observe(price, sale.item_price, floor, 'price', key, sale.date, sale.sale_id)
+
+        daily = self._quantities.get(key)
+        if daily is None:
+            daily = self._quantities[key] = DailyQuantity(*key)
+        day = sale.date.date()
+        if self.latest_day is None or day > self.latest_day:
+            self.latest_day = day
+        if daily.day != day:
+            self._close_day(daily)
+            daily.day = day
+            daily.quantity = 0
+            self._open_days.setdefault(day, {})[key] = daily
+        daily.quantity += sale.quantity
+
+    def flush(self, final=False):
+        # Sales arrive in time order, so a day older than the newest one seen
+        # is complete and can be checked even if that key sells nothing more.
+        # The newest day may still grow and stays open unless final is set.
+        start = len(self.anomalies)
+        days = sorted(day for day in self._open_days if final or day < self.latest_day)
+        for day in days:
+            for daily in self._open_days.pop(day).values():
+                self._score_day(daily)
+                daily.day = None
+                daily.quantity = 0
+        return self.anomalies[start:]
+
+    def _close_day(self, daily):
+        if daily.day is not None:
+            self._score_day(daily)
+            open_keys = self._open_days[daily.day]
+            del open_keys[(daily.branch_id, daily.product_id)]
+            if not open_keys:
+                del self._open_days[daily.day]
+
+    def _score_day(self, daily):
+        # Daily counts vary at least as much as a Poisson count would
+        floor = max(daily.mean, 1.0) ** 0.5
+        self._observe(daily, daily.quantity, floor, 'quantity', (daily.branch_id, daily.product_id), daily.day, None)
+
+    def _observe(self, statistic, value, floor, kind, key, date, sale_id):
+        score, scale = statistic.score(value, floor)
+        if statistic.count >= self.warmup and abs(score) >= self.threshold:
+            self.anomalies.append({
+                'kind': kind,
+                'branch_id': key[0],
+                'product_id': key[1],
+                'date': date,
+                'sale_id': sale_id,
+                'value': value,
+                'expected': statistic.mean,
+                'score': score
+            })
+        statistic.update(value, self.alpha, self.threshold * scale)
+
+class AnomalyAnalysisStrategy(ABC):
+    @abstractmethod
+    def analyze(self, product_id=None):
+        pass
+
+class SalesAnomalyAnalysis(AnomalyAnalysisStrategy):
+    def __init__(self, branches, **detector_options):
+        self.branches = branches
+        self.detector_options = detector_options
+
+    def analyze(self, product_id=None):
+        detector = SalesAnomalyDetector(**self.detector_options)
+        sales = sorted((sale for branch in self.branches for sale in branch.sales), key=lambda sale: sale.date)
+        detector.process_sales(sales)
+        detector.flush(final=True)
+        return filter_anomalies(detector.anomalies, product_id)
+
+def filter_anomalies(anomalies, product_id=None):
+    if product_id is None:
+        return list(anomalies)
+    return [anomaly for anomaly in anomalies if anomaly['product_id'] == product_id]
+
+def print_anomalies_table(anomalies):
+    if not anomalies:
+        print("No anomalies detected.")
+        return
+    TableRenderer(["Type", "Branch ID", "Product ID", "Date", "Sale ID", "Value", "Expected", "Score"]).render(
+        (
+            (a['kind'], a['branch_id'], a['product_id'], a['date'], a['sale_id'] or '-',
+             a['value'], f"{a['expected']:.2f}", f"{a['score']:.1f}")
+            for a in anomalies
+        )
+    )
@@ -0,0 +1,271 @@
+import copy
+from abc import ABC, abstractmethod
+from statistics import NormalDist
+import numpy as np
+import matplotlib.pyplot as plt
+from sales_columns import SalesColumns
+
+# Stratified random sample of the sales, one stratum per (branch, day). Every
+# stratum keeps at least two rows (or all of them) so its variance can be
+# estimated. Totals are scaled back up with the stratified estimator and come
+# with a normal-approximation confidence interval.
+class StratifiedSample:
+    def __init__(self, columns, fraction=None, target_error=None, confidence=0.95, seed=None):
+        if fraction is None and target_error is None:
+            raise ValueError("Either a sample fraction or a target error is required.")
+        self.confidence = confidence
+        self.z = NormalDist().inv_cdf((1 + confidence) / 2)
+        self.population = len(columns)
+        if fraction is None:
+            fraction = self._fraction_for_error(columns.total_price, target_error)
+        self.fraction = min(max(fraction, 0.0), 1.0)
+        self._rng = np.random.default_rng(seed)
+
+        strata, self.population_sizes, self.sample_sizes, chosen = self._draw(columns)
+        self.columns = columns.take(chosen)
+        self.strata = strata[chosen]
+        self.weights = (self.population_sizes / self.sample_sizes)[self.strata]
+
+    def _draw(self, columns):
+        days = columns.days()
+        _, day_codes = np.unique(days, return_inverse=True)
+        n_days = int(day_codes.max()) + 1 if len(columns) else 0
+        _, strata = np.unique(columns.branch_codes * n_days + day_codes.reshape(-1), return_inverse=True)
+        strata = strata.reshape(-1)
+        population_sizes = np.bincount(strata).astype(np.float64)
+        sample_sizes = np.minimum(population_sizes, np.maximum(np.ceil(self.fraction * population_sizes), 2))
+
+        # Shuffle within each stratum and keep the first n_h rows
+        order = np.lexsort((self._rng.random(len(columns)), strata))
+        sorted_strata = strata[order]
+        starts = np.concatenate([[0], np.cumsum(population_sizes)[:-1]]).astype(np.int64)
+        rank = np.arange(len(columns)) - starts[sorted_strata]
+        chosen = np.sort(order[rank < sample_sizes[sorted_strata]])
+        return strata, population_sizes, sample_sizes, chosen
+
+    def extend(self, columns):
+        # Newly loaded sales are sampled on their own, as further (branch, day)
+        # strata, so the rows already drawn and their weights stay as they were.
+        # The result is a new sample; this one is left untouched for readers.
+        if not len(columns):
+            return self
+        strata, population_sizes, sample_sizes, chosen = self._draw(columns)
+        sample = copy.copy(self)
+        strata = strata[chosen] + len(self.population_sizes)
+        sample.population = self.population + len(columns)
+        sample.population_sizes = np.concatenate([self.population_sizes, population_sizes])
+        sample.sample_sizes = np.concatenate([self.sample_sizes, sample_sizes])
+        sample.columns = self.columns.concat(columns.take(chosen))
+        sample.strata = np.concatenate([self.strata, strata])
+        sample.weights = np.concatenate([self.weights, (sample.population_sizes / sample.sample_sizes)[strata]])
+        return sample
+
+    @classmethod
+    def from_branches(cls, branches, fraction=None, target_error=None, confidence=0.95, seed=None):
+        return cls(SalesColumns.from_branches(branches), fraction, target_error, confidence, seed)
+
+    def __len__(self):
+        return len(self.columns)
+
+    def _fraction_for_error(self, values, target_error):
+        # Simple random sampling bound on the relative error of the revenue
+        # total; stratifying by branch and day only tightens it
+        if len(values) < 2 or values.mean() == 0:
+            return 1.0
+        cv = values.std(ddof=1) / values.mean()
+        required = (self.z * cv / target_error) ** 2
+        return required / (len(values) + required)
+
+    def estimate(self, values, groups=None, n_groups=1, mask=None):
+        values = np.broadcast_to(np.asarray(values, dtype=np.float64), self.strata.shape)
+        if mask is not None:
+            values = np.where(mask, values, 0.0)
+        if groups is None:
+            groups = np.zeros(len(self.strata), dtype=np.int64)
+
+        n_strata = len(self.population_sizes)
+        keys, inverse = np.unique(groups * n_strata + self.strata, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        sums = np.bincount(inverse, weights=values)
+        squares = np.bincount(inverse, weights=values * values)
+
+        strata = keys % n_strata
+        cells = keys // n_strata
+        N = self.population_sizes[strata]
+        n = self.sample_sizes[strata]
+        variance = np.where(n > 1, (squares - sums * sums / n) / np.maximum(n - 1, 1), 0.0)
+
+        totals = np.bincount(cells, weights=N / n * sums, minlength=n_groups)
+        variances = np.bincount(cells, weights=N * N * (1 - n / N) * variance / n, minlength=n_groups)
+        return totals, self.z * np.sqrt(np.maximum(variances, 0.0))
+
+    def estimate_ratio(self, numerator, denominator, groups=None, n_groups=1, mask=None):
+        numerator_totals, _ = self.estimate(numerator, groups, n_groups, mask)
+        denominator_totals, _ = self.estimate(denominator, groups, n_groups, mask)
+        ratios = np.divide(numerator_totals, denominator_totals,
+                           out=np.zeros(n_groups), where=denominator_totals > 0)
+        # Linearized variance of the ratio estimator
+        row_ratios = ratios[groups] if groups is not None else ratios[0]
+        residuals = np.asarray(numerator, dtype=np.float64) - row_ratios * np.asarray(denominator, dtype=np.float64)
+        _, margins = self.estimate(residuals, groups, n_groups, mask)
+        margins = np.divide(margins, denominator_totals, out=np.zeros(n_groups), where=denominator_totals > 0)
+        return ratios, margins
+
+def _figure(value, margin):
+    return {'estimate': float(value), 'ci_low': float(value - margin), 'ci_high': float(value + margin)}
+
+def format_figure(figure):
+    margin = (figure['ci_high'] - figure['ci_low']) / 2
+    return f"{figure['estimate']:.2f} ± {margin:.2f}"
+
+def _product_ranking(sample, mask, groups, n_groups, n_products):
+    columns = sample.columns
+    cells = groups * n_products + columns.product_codes
+    quantity, quantity_margin = sample.estimate(columns.quantity, cells, n_groups * n_products, mask)
+    revenue, revenue_margin = sample.estimate(columns.total_price, cells, n_groups * n_products, mask)
+    seen = np.bincount(cells[mask], minlength=n_groups * n_products) > 0
+
+    rankings = []
+    for group in range(n_groups):
+        offset = group * n_products
+        products = [p for p in range(n_products) if seen[offset + p]]
+        products.sort(key=lambda p: quantity[offset + p], reverse=True)
+        rankings.append([
+            (columns.product_ids[p], {
+                'quantity': _figure(quantity[offset + p], quantity_margin[offset + p]),
+                'revenue': _figure(revenue[offset + p], revenue_margin[offset + p])
+            })
+            for p in products
+        ])
+    return rankings
+
+class ApproximateAnalysisStrategy(ABC):
+    @abstractmethod
+    def analyze(self, *args, **kwargs):
+        pass
+
+class ApproximateMonthlySalesAnalysis(ApproximateAnalysisStrategy):
+    def __init__(self, sample):
+        self.sample = sample
+
+    def analyze(self, month, year):
+        sample = self.sample
+        columns = sample.columns
+        mask = columns.timestamps.astype('datetime64[M]') == np.datetime64(f'{year}-{month:02d}', 'M')
+        branches = columns.branch_codes
+        n_branches = len(columns.branch_ids)
+        n_categories = len(columns.categories)
+
+        total, total_margin = sample.estimate(columns.total_price, branches, n_branches, mask)
+        volume, volume_margin = sample.estimate(columns.quantity, branches, n_branches, mask)
+        customers, customer_margin = sample.estimate(1.0, branches, n_branches, mask)
+        average, average_margin = sample.estimate_ratio(columns.total_price, np.ones(len(sample)), branches, n_branches, mask)
+        rankings = _product_ranking(sample, mask, branches, n_branches, len(columns.product_ids))
+
+        category_cells = branches * n_categories + columns.category_codes
+        category_quantity, category_quantity_margin = sample.estimate(columns.quantity, category_cells, n_branches * n_categories, mask)
+        category_revenue, category_revenue_margin = sample.estimate(columns.total_price, category_cells, n_branches * n_categories, mask)
+        category_seen = np.bincount(category_cells[mask], minlength=n_branches * n_categories) > 0
+
+        analysis = {}
+        for code, branch_id in enumerate(columns.branch_ids):
+            offset = code * n_categories
+            analysis[branch_id] = {
+                'total_sales_amount': _figure(total[code], total_margin[code]),
+                'sales_volume': _figure(volume[code], volume_margin[code]),
+                'customer_count': _figure(customers[code], customer_margin[code]),
+                'average_transaction_value': _figure(average[code], average_margin[code]),
+                'top_selling_products': rankings[code][:10],
+                'low_selling_products': rankings[code][-10:],
+                'sales_by_product_category': {
+                    category: {
+                        'quantity': _figure(category_quantity[offset + c], category_quantity_margin[offset + c]),
+                        'revenue': _figure(category_revenue[offset + c], category_revenue_margin[offset + c])
+                    }
+                    for c, category in enumerate(columns.categories) if category_seen[offset + c]
+                }
+            }
+        return analysis
+
+class ApproximateWeeklySalesAnalysis(ApproximateAnalysisStrategy):
+    def __init__(self, sample):
+        self.sample = sample
+
+    def analyze(self, year):
+        sample = self.sample
+        columns = sample.columns
+        days = columns.days()
+        mask = days.astype('datetime64[Y]') == np.datetime64(str(year), 'Y')
+        week_starts = days - columns.weekdays().astype('timedelta64[D]')
+        weeks, week_codes = np.unique(week_starts, return_inverse=True)
+        week_codes = week_codes.reshape(-1)
+        n_weeks = len(weeks)
+
+        total, total_margin = sample.estimate(columns.total_price, week_codes, n_weeks, mask)
+        quantity, quantity_margin = sample.estimate(columns.quantity, week_codes, n_weeks, mask)
+        customers, customer_margin = sample.estimate(1.0, week_codes, n_weeks, mask)
+        average, average_margin = sample.estimate_ratio(columns.total_price, np.ones(len(sample)), week_codes, n_weeks, mask)
+        rankings = _product_ranking(sample, mask, week_codes, n_weeks, len(columns.product_ids))
+        present = np.bincount(week_codes[mask], minlength=n_weeks) > 0
+
+        weekly_sales = {}
+        for code, week_start in enumerate(weeks):
+            if not present[code]:
+                continue
+            week_key = f"{week_start} - {week_start + np.timedelta64(6, 'D')}"
+            weekly_sales[week_key] = {
+                'total_sales_amount': _figure(total[code], total_margin[code]),
+                'customer_count': _figure(customers[code], customer_margin[code]),
+                'average_transaction_value': _figure(average[code], average_margin[code]),
+                'total_quantity': _figure(quantity[code], quantity_margin[code]),
+                'top_selling_products': rankings[code][:10]
+            }
+        return weekly_sales
+
+class ApproximatePopularProductsAnalysis(ApproximateAnalysisStrategy):
+    def __init__(self, sample):
+        self.sample = sample
+
+    def analyze(self):
+        mask = np.ones(len(self.sample), dtype=bool)
+        groups = np.zeros(len(self.sample), dtype=np.int64)
+        return _product_ranking(self.sample, mask, groups, 1, len(self.sample.columns.product_ids))[0][:10]
+
+def approximate_sales_distribution(sample):
+    sales = sample.columns.total_price
+    average, average_margin = sample.estimate_ratio(sales, np.ones(len(sample)))
+
+    def count(mask):
+        totals, margins = sample.estimate(1.0, mask=mask)
+        return _figure(totals[0], margins[0])
+
+    return {
+        'average_purchase_value': _figure(average[0], average_margin[0]),
+        'below_1000': count(sales < 1000),
+        'between_1000_and_5000': count((sales >= 1000) & (sales <= 5000)),
+        'above_5000': count(sales > 5000)
+    }
+
+def approximate_sales_distribution_analysis(sample):
+    if len(sample) == 0:
+        print("No sales data available.")
+        return
+
+    distribution = approximate_sales_distribution(sample)
+    print(f"\n=== Approximate Sales Distribution Analysis ({sample.confidence:.0%} CI) ===\n")
+
+    plt.figure(figsize=(12, 6))
+    plt.hist(sample.columns.total_price, bins=20, weights=sample.weights, edgecolor='black', color='skyblue')
+    plt.title('Sales Distribution (Estimated)')
+    plt.xlabel('Total Sales Amount (LKR)')
+    plt.ylabel('Estimated Frequency')
+    plt.grid(True)
+    plt.show()
+
+    print("\n--- Average Purchase Value ---")
+    print(f"Average Purchase Value: {format_figure(distribution['average_purchase_value'])} LKR")
+
+    print("\n--- Purchase Value Segmentation ---")
+    print(f"Purchases below 1000 LKR: {format_figure(distribution['below_1000'])}")
+    print(f"Purchases between 1000 and 5000 LKR: {format_figure(distribution['between_1000_and_5000'])}")
+    print(f"Purchases above 5000 LKR: {format_figure(distribution['above_5000'])}")
@@ -8,5 +8,10 @@ class Branch:
     def add_sale(self, sale):
         self.sales.append(sale)
 
+    def with_sales(self, sales):
+        branch = Branch(self.branch_id, self.name, self.location)
+        branch.sales = sales
+        return branch
+
     def __repr__(self):
         return f'Branch(id={self.branch_id}, name={self.name}, location={self.location}, sales={self.sales})'
@@ -0,0 +1,140 @@
+from abc import ABC, abstractmethod
+import numpy as np
+from scipy import sparse
+from sales_columns import SalesColumns
+from table_renderer import TableRenderer
+
+class BranchComparisonStrategy(ABC):
+    @abstractmethod
+    def analyze(self, month=None, year=None):
+        pass
+
+# Branch x product (or branch x category) matrices built in one pass over the
+# sales columns and kept sparse, since most branches sell only part of the
+# catalogue. Shares, ranks and branch similarities are derived from them with
+# sparse linear algebra.
+class BranchComparisonAnalysis(BranchComparisonStrategy):
+    def __init__(self, branches, dimension='product', metric='revenue', columns=None):
+        if dimension not in ('product', 'category'):
+            raise ValueError(f"Unknown dimension {dimension}. Expected product or category.")
+        if metric not in ('revenue', 'quantity'):
+            raise ValueError(f"Unknown metric {metric}. Expected revenue or quantity.")
+        self.branch_ids = [branch.branch_id for branch in branches]
+        self.dimension = dimension
+        self.metric = metric
+        self.columns = columns if columns is not None else SalesColumns.from_branches(branches)
+
+    def analyze(self, month=None, year=None):
+        matrix, keys = self._build_matrix(month, year)
+        # One branch x branch Gram matrix serves both similarity measures
+        gram = (matrix @ matrix.T).toarray()
+        return {
+            'branches': list(self.branch_ids),
+            'keys': keys,
+            'matrix': matrix,
+            'branch_totals': np.asarray(matrix.sum(axis=1)).ravel(),
+            'key_totals': np.asarray(matrix.sum(axis=0)).ravel(),
+            'share_of_wallet': _normalize_columns(matrix),
+            'mix': _normalize_rows(matrix),
+            'ranks': _column_ranks(matrix),
+            'cosine_similarity': cosine_similarity(matrix, gram),
+            'correlation': correlation(matrix, gram)
+        }
+
+    def _build_matrix(self, month, year):
+        columns = self.columns
+        if self.dimension == 'product':
+            keys, codes = columns.product_ids, columns.product_codes
+        else:
+            keys, codes = columns.categories, columns.category_codes
+        values = columns.total_price if self.metric == 'revenue' else columns.quantity.astype(np.float64)
+
+        rows = columns.branch_rows(self.branch_ids)
+
+        mask = rows >= 0
+        if year is not None:
+            mask &= columns.timestamps.astype('datetime64[Y]') == np.datetime64(str(year), 'Y')
+        if month is not None:
+            months = columns.timestamps.astype('datetime64[M]').astype(np.int64) % 12 + 1
+            mask &= months == month
+
+        # Duplicate (branch, key) entries are summed when converting to CSR
+        matrix = sparse.coo_matrix(
+            (values[mask], (rows[mask], codes[mask])),
+            shape=(len(self.branch_ids), len(keys))
+        ).tocsr()
+        return matrix, list(keys)
+
+def _normalize_rows(matrix):
+    totals = np.asarray(matrix.sum(axis=1)).ravel()
+    scale = np.divide(1.0, totals, out=np.zeros_like(totals), where=totals != 0)
+    return sparse.diags(scale) @ matrix
+
+def _normalize_columns(matrix):
+    totals = np.asarray(matrix.sum(axis=0)).ravel()
+    scale = np.divide(1.0, totals, out=np.zeros_like(totals), where=totals != 0)
+    return (matrix @ sparse.diags(scale)).tocsr()
+
+def _column_ranks(matrix):
+    # Rank 1 is the branch with the largest value for that product; only
+    # stored (non-zero) cells are ranked
+    coo = matrix.tocoo()
+    order = np.lexsort((-coo.data, coo.col))
+    cols = coo.col[order]
+    starts = np.searchsorted(cols, np.arange(matrix.shape[1]))
+    ranks = np.arange(len(order)) - starts[cols] + 1
+    return sparse.coo_matrix((ranks, (coo.row[order], cols)), shape=matrix.shape).tocsr()
+
+def cosine_similarity(matrix, gram=None):
+    if gram is None:
+        gram = (matrix @ matrix.T).toarray()
+    norms = np.sqrt(np.clip(np.diag(gram), 0.0, None))
+    scale = np.outer(norms, norms)
+    return np.divide(gram, scale, out=np.zeros_like(gram), where=scale > 0)
+
+def correlation(matrix, gram=None):
+    # Pearson correlation between branch rows without densifying the matrix:
+    # cov = (X X^T - n m m^T) / (n - 1)
+    n = matrix.shape[1]
+    if n < 2:
+        return np.zeros((matrix.shape[0], matrix.shape[0]))
+    if gram is None:
+        gram = (matrix @ matrix.T).toarray()
+    means = np.asarray(matrix.mean(axis=1)).ravel()
+    covariance = (gram - n * np.outer(means, means)) / (n - 1)
+    deviations = np.sqrt(np.clip(np.diag(covariance), 0.0, None))
+    scale = np.outer(deviations, deviations)
+    return np.divide(covariance, scale, out=np.zeros_like(covariance), where=scale > 0)
+
+def most_similar_branches(comparison, branch_id, method='cosine_similarity', top=5):
+    index = comparison['branches'].index(branch_id)
+    scores = comparison[method][index].copy()
+    scores[index] = -np.inf
+    order = np.argsort(-scores)[:top]
+    return [(comparison['branches'][i], float(scores[i])) for i in order if np.isfinite(scores[i])]
+
+def print_branch_comparison_table(comparison, top=10):
+    # Side-by-side view of the top keys by total, one column per branch
+    matrix = comparison['matrix'].tocsc()
+    shares = comparison['share_of_wallet'].tocsc()
+    top_keys = np.argsort(-comparison['key_totals'])[:top]
+    TableRenderer(["Key", "Total"] + comparison['branches']).render(
+        (
+            [comparison['keys'][k], f"{comparison['key_totals'][k]:.2f}"] + [
+                f"{value:.2f} ({share:.0%})"
+                for value, share in zip(matrix[:, k].toarray().ravel(), shares[:, k].toarray().ravel())
+            ]
+            for k in top_keys
+        )
+    )
+
+def print_branch_similarity_table(comparison, branch_ids=None, method='cosine_similarity', top=3):
+    # The nearest branches of each listed branch rather than the full
+    # branch x branch matrix, which is unreadable past a handful of branches
+    branch_ids = comparison['branches'] if branch_ids is None else branch_ids
+    TableRenderer(["Branch ID", "Most Similar Branches"]).render(
+        (
+            [branch_id, ", ".join(f"{other} ({score:.3f})" for other, score in most_similar_branches(comparison, branch_id, method, top))]
+            for branch_id in branch_ids
+        )
+    )
@@ -0,0 +1,124 @@
+import hashlib
+import json
+import os
+from datetime import datetime
+import numpy as np
+import matplotlib.pyplot as plt
+
+MAX_POINTS = 1000
+
+def lttb(x, y, threshold=MAX_POINTS):
+    # Largest-triangle-three-buckets: keeps the first and last point and, from
+    # each bucket in between, the point forming the largest triangle with the
+    # previously kept point and the average of the next bucket.
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    previous = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            avg_x = x[end:edges[i + 2]].mean()
+            avg_y = y[end:edges[i + 2]].mean()
+        else:
+            avg_x, avg_y = x[n - 1], y[n - 1]
+        areas = np.abs(
+            (x[previous] - avg_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (avg_y - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        selected[i + 1] = previous
+    selected[-1] = n - 1
+    return selected
+
+def downsample_dates(dates, values, threshold=MAX_POINTS, date_format='%Y/%m/%d'):
+    # Dates arrive as the report's string keys; plot them as real dates so
+    # series downsampled to different points still share one axis
+    parsed = [datetime.strptime(date, date_format) for date in dates]
+    positions = [date.timestamp() for date in parsed]
+    keep = lttb(positions, values, threshold)
+    return [parsed[i] for i in keep], [values[i] for i in keep]
+
+# Rendered charts are stored as PNG files named after a hash of the plotted
+# data and chart options, so an unchanged chart is only ever drawn once. The
+# least recently used files are removed once the cache holds more than
+# max_files charts or max_bytes in total.
+class ChartCache:
+    def __init__(self, directory='.chart_cache', enabled=True, dpi=100, max_files=200, max_bytes=100 * 1024 * 1024):
+        self.directory = directory
+        self.enabled = enabled
+        self.dpi = dpi
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+
+    def key(self, name, data, options):
+        payload = json.dumps({'name': name, 'data': data, 'options': options}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def path(self, name, data, options):
+        return os.path.join(self.directory, f'{name}-{self.key(name, data, options)}.png')
+
+    def render(self, name, data, options, draw, show=True):
+        if not self.enabled:
+            plt.figure(figsize=options.get('figsize'))
+            draw()
+            if show:
+                plt.show()
+            return None
+
+        path = self.path(name, data, options)
+        if os.path.exists(path):
+            # Mark as recently used so pruning keeps it
+            os.utime(path)
+            if show:
+                self._show_image(path, options.get('figsize'))
+            return path
+
+        os.makedirs(self.directory, exist_ok=True)
+        figure = plt.figure(figsize=options.get('figsize'))
+        draw()
+        # Write to a temporary name first so a crash never leaves half a PNG in the cache
+        temporary = f'{path}.{os.getpid()}.tmp.png'
+        figure.savefig(temporary, dpi=self.dpi)
+        os.replace(temporary, path)
+        self.prune(keep=path)
+        if show:
+            plt.show()
+        else:
+            plt.close(figure)
+        return path
+
+    def prune(self, keep=None):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.png') and not entry.name.endswith('.tmp.png'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        entries.sort()
+        count, size = len(entries), sum(entry[1] for entry in entries)
+        for _, file_size, path in entries:
+            if count <= self.max_files and size <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            count -= 1
+            size -= file_size
+
+    def _show_image(self, path, figsize):
+        plt.figure(figsize=figsize)
+        plt.imshow(plt.imread(path))
+        plt.axis('off')
+        plt.tight_layout(pad=0)
+        plt.show()
+
+chart_cache = ChartCache()
@@ -0,0 +1,200 @@
+from datetime import datetime
+import numpy as np
+from sales_columns import SalesColumns
+
+GROUPS = ('branch', 'category', 'product')
+METRICS = ('revenue', 'quantity', 'transactions')
+
+# Cumulative daily arrays per branch, category and product. Column d + 1 of each
+# array holds the running total up to and including day d, so any date-range
+# total is the difference of two lookups. The arrays are allocated with spare
+# rows and columns that double when full, so appending a day or a key does not
+# copy everything already stored.
+class DailySalesSeries:
+    def __init__(self, branches=None):
+        self.reset()
+        if branches is not None:
+            self.add_keys('branch', [branch.branch_id for branch in branches])
+            self.append(SalesColumns.from_branches(branches))
+
+    def reset(self):
+        self.start_day = None
+        self.n_days = 0
+        self.keys = {group: [] for group in GROUPS}
+        self._key_index = {group: {} for group in GROUPS}
+        self._arrays = {
+            group: {metric: np.zeros((0, 1)) for metric in METRICS}
+            for group in GROUPS
+        }
+
+    @property
+    def cumulative(self):
+        return {
+            group: {metric: self._cumulative(group, metric) for metric in METRICS}
+            for group in GROUPS
+        }
+
+    def _cumulative(self, group, metric):
+        return self._arrays[group][metric][:len(self.keys[group]), :self.n_days + 1]
+
+    # Observer hook for Database ingest notifications
+    def update(self, data):
+        if data.get('full_reload'):
+            self.reset()
+        if data.get('branches') is not None:
+            self.add_keys('branch', [branch.branch_id for branch in data['branches']])
+        self.append_sales(data['sales'])
+
+    def add_keys(self, group, keys):
+        # Keys without sales yet, so their totals are 0 rather than unknown
+        self._global_codes(group, list(keys), np.empty(0, dtype=np.int64))
+
+    def append(self, columns):
+        if len(columns) == 0:
+            return
+
+        days = columns.days()
+        if self.start_day is None:
+            self.start_day = days.min()
+        elif days.min() < self.start_day:
+            self._prepend_days(int((self.start_day - days.min()).astype(np.int64)))
+        day_offsets = (days - self.start_day).astype(np.int64)
+
+        first_day = int(day_offsets.min())
+        self._extend_days(int(day_offsets.max()) + 1)
+        local_days = day_offsets - first_day
+        span = self.n_days - first_day
+
+        group_codes = {
+            'branch': self._global_codes('branch', columns.branch_ids, columns.branch_codes),
+            'category': self._global_codes('category', columns.categories, columns.category_codes),
+            'product': self._global_codes('product', columns.product_ids, columns.product_codes)
+        }
+        weights = {
+            'revenue': columns.total_price,
+            'quantity': columns.quantity.astype(np.float64),
+            'transactions': None
+        }
+
+        for group, codes in group_codes.items():
+            n_keys = len(self.keys[group])
+            flat_index = codes * span + local_days
+            for metric, weight in weights.items():
+                daily = np.bincount(flat_index, weights=weight, minlength=n_keys * span)
+                cumulative = self._cumulative(group, metric)
+                cumulative[:, first_day + 1:] += np.cumsum(daily.reshape(n_keys, span), axis=1)
+
+    def append_sales(self, sales):
+        self.append(SalesColumns.from_sales(sales))
+
+    def _reserve(self, group, n_keys, n_columns):
+        for metric in METRICS:
+            array = self._arrays[group][metric]
+            rows, columns = array.shape
+            if n_keys <= rows and n_columns <= columns:
+                continue
+            grown = np.zeros((max(n_keys, 2 * rows), max(n_columns, 2 * columns)))
+            grown[:rows, :columns] = array
+            self._arrays[group][metric] = grown
+
+    def _extend_days(self, n_days):
+        if n_days <= self.n_days:
+            return
+        for group in GROUPS:
+            self._reserve(group, len(self.keys[group]), n_days + 1)
+            n_keys = len(self.keys[group])
+            for metric in METRICS:
+                # New days carry the running total forward
+                array = self._arrays[group][metric]
+                array[:n_keys, self.n_days + 1:n_days + 1] = array[:n_keys, self.n_days:self.n_days + 1]
+        self.n_days = n_days
+
+    def _prepend_days(self, extra):
+        # Sales older than the first stored day shift every column right; the
+        # new leading columns are zero since nothing was sold before them
+        for group in GROUPS:
+            n_keys = len(self.keys[group])
+            for metric in METRICS:
+                array = self._arrays[group][metric]
+                grown = np.zeros((array.shape[0], array.shape[1] + extra))
+                grown[:n_keys, extra:extra + self.n_days + 1] = array[:n_keys, :self.n_days + 1]
+                self._arrays[group][metric] = grown
+        self.start_day -= np.timedelta64(extra, 'D')
+        self.n_days += extra
+
+    def _global_codes(self, group, local_keys, local_codes):
+        index = self._key_index[group]
+        mapping = np.empty(len(local_keys), dtype=np.int64)
+        for code, key in enumerate(local_keys):
+            if key not in index:
+                index[key] = len(self.keys[group])
+                self.keys[group].append(key)
+            mapping[code] = index[key]
+        # Rows past the old key count are still zero, so new keys only need room
+        self._reserve(group, len(self.keys[group]), self.n_days + 1)
+        return mapping[local_codes]
+
+    def _day_offset(self, value):
+        if isinstance(value, str):
+            value = datetime.strptime(value, '%Y-%m-%d').date()
+        elif isinstance(value, datetime):
+            value = value.date()
+        return int((np.datetime64(value, 'D') - self.start_day).astype(np.int64))
+
+    def _row(self, group, key):
+        if group not in GROUPS:
+            raise ValueError(f"Unknown group {group}. Expected one of {', '.join(GROUPS)}.")
+        row = self._key_index[group].get(key)
+        if row is None:
+            raise ValueError(f"{group.capitalize()} {key} not found.")
+        return row
+
+    def total(self, group, key, start, end, metric='revenue'):
+        row = self._row(group, key)
+        if self.start_day is None:
+            return 0.0
+        first = max(self._day_offset(start), 0)
+        last = min(self._day_offset(end), self.n_days - 1)
+        if first > last:
+            return 0.0
+        cumulative = self._cumulative(group, metric)
+        return float(cumulative[row, last + 1] - cumulative[row, first])
+
+    def average(self, group, key, start, end, metric='revenue'):
+        days = self._day_offset(end) - self._day_offset(start) + 1 if self.start_day is not None else 0
+        if days <= 0:
+            return 0.0
+        return self.total(group, key, start, end, metric) / days
+
+    def dates(self):
+        if self.start_day is None:
+            return np.array([], dtype='datetime64[D]')
+        return self.start_day + np.arange(self.n_days)
+
+    def daily(self, group, metric='revenue'):
+        return np.diff(self._cumulative(group, metric), axis=1)
+
+    def rolling_sum(self, group, metric='revenue', window=7):
+        cumulative = self._cumulative(group, metric)
+        sums = np.full((cumulative.shape[0], self.n_days), np.nan)
+        if window <= self.n_days:
+            sums[:, window - 1:] = cumulative[:, window:] - cumulative[:, :-window]
+        return sums
+
+    def rolling_mean(self, group, metric='revenue', window=7):
+        return self.rolling_sum(group, metric, window) / window
+
+    def week_over_week(self, group, metric='revenue'):
+        weekly = self.rolling_sum(group, metric, window=7)
+        deltas = np.full_like(weekly, np.nan)
+        deltas[:, 7:] = weekly[:, 7:] - weekly[:, :-7]
+        return deltas
+
+    def trend_report(self, group='branch', metric='revenue'):
+        return {
+            'dates': self.dates(),
+            'keys': list(self.keys[group]),
+            'moving_average_7': self.rolling_mean(group, metric, window=7),
+            'moving_average_28': self.rolling_mean(group, metric, window=28),
+            'week_over_week': self.week_over_week(group, metric)
+        }
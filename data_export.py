@@ -0,0 +1,226 @@
+import argparse
+import csv
+import json
+import os
+from abc import ABC, abstractmethod
+from database import Database
+from sales_analysis import MonthlySalesAnalysis
+from weekly_sales_analysis import WeeklySalesAnalysis
+from product_preference_analysis import PopularProductsAnalysis
+
+# Column types understood by every writer
+STRING, INT64, FLOAT64, TIMESTAMP = 'string', 'int64', 'float64', 'timestamp'
+
+SALES_SCHEMA = [
+    ('sale_id', STRING), ('branch_id', STRING), ('product_id', STRING), ('category', STRING),
+    ('quantity', INT64), ('item_price', FLOAT64), ('total_price', FLOAT64),
+    ('date', TIMESTAMP), ('basket_id', STRING)
+]
+MONTHLY_SCHEMA = [
+    ('branch_id', STRING), ('total_sales_amount', FLOAT64), ('customer_count', INT64),
+    ('sales_volume', INT64), ('average_transaction_value', FLOAT64)
+]
+DAILY_SCHEMA = [('branch_id', STRING), ('date', STRING), ('quantity', INT64), ('revenue', FLOAT64)]
+WEEKLY_SCHEMA = [
+    ('week', STRING), ('total_sales_amount', FLOAT64), ('customer_count', INT64),
+    ('average_transaction_value', FLOAT64), ('total_quantity', INT64)
+]
+PRODUCT_SCHEMA = [('rank', INT64), ('product_id', STRING), ('quantity', INT64), ('revenue', FLOAT64)]
+PRICE_SCHEMA = [
+    ('product_id', STRING), ('sales_count', INT64), ('average_selling_price', FLOAT64),
+    ('price_variation', FLOAT64), ('min_price', FLOAT64), ('max_price', FLOAT64)
+]
+
+FORMATS = {'.csv': 'csv', '.parquet': 'parquet', '.arrow': 'arrow', '.feather': 'arrow'}
+
+# Writers receive column batches, so nothing larger than one batch is ever
+# held in memory regardless of how many rows are exported.
+class ExportWriter(ABC):
+    def __init__(self, path, schema):
+        self.path = path
+        self.schema = schema
+
+    @abstractmethod
+    def write_batch(self, columns):
+        pass
+
+    @abstractmethod
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
+
+# Plain CSV with a <file>.schema.json sidecar describing the column types
+class TypedCSVWriter(ExportWriter):
+    def __init__(self, path, schema):
+        super().__init__(path, schema)
+        with open(f'{path}.schema.json', 'w') as f:
+            json.dump([{'name': name, 'type': kind} for name, kind in schema], f, indent=2)
+        self._file = open(path, 'w', newline='', buffering=1 << 20)
+        self._writer = csv.writer(self._file)
+        self._writer.writerow([name for name, _ in schema])
+
+    def write_batch(self, columns):
+        self._writer.writerows(zip(*[_csv_column(values, kind) for values, (_, kind) in zip(columns, self.schema)]))
+
+    def close(self):
+        self._file.close()
+
+def _csv_column(values, kind):
+    if kind == TIMESTAMP:
+        return [value.isoformat(sep=' ') if value is not None else '' for value in values]
+    return ['' if value is None else value for value in values]
+
+class ArrowWriter(ExportWriter):
+    def __init__(self, path, schema, file_format):
+        super().__init__(path, schema)
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise ValueError(f"Exporting to {file_format} requires pyarrow. Install it or export to CSV.")
+        self._pa = pa
+        self._schema = pa.schema([(name, _arrow_type(pa, kind)) for name, kind in schema])
+        if file_format == 'parquet':
+            import pyarrow.parquet as pq
+            self._writer = pq.ParquetWriter(path, self._schema)
+        else:
+            self._writer = pa.ipc.new_file(path, self._schema)
+        self._file_format = file_format
+
+    def write_batch(self, columns):
+        batch = self._pa.record_batch(
+            [self._pa.array(values, type=field.type) for values, field in zip(columns, self._schema)],
+            schema=self._schema
+        )
+        if self._file_format == 'parquet':
+            self._writer.write_table(self._pa.Table.from_batches([batch]))
+        else:
+            self._writer.write_batch(batch)
+
+    def close(self):
+        self._writer.close()
+
+def _arrow_type(pa, kind):
+    return {STRING: pa.string(), INT64: pa.int64(), FLOAT64: pa.float64(), TIMESTAMP: pa.timestamp('s')}[kind]
+
+def create_writer(path, schema, file_format=None):
+    if file_format is None:
+        file_format = FORMATS.get(os.path.splitext(path)[1].lower())
+    if file_format == 'csv':
+        return TypedCSVWriter(path, schema)
+    if file_format in ('parquet', 'arrow'):
+        return ArrowWriter(path, schema, file_format)
+    raise ValueError(f"Unsupported export format for {path}. Use one of: {', '.join(sorted(FORMATS))}.")
+
+def write_rows(rows, path, schema, file_format=None, batch_size=65536):
+    count = 0
+    with create_writer(path, schema, file_format) as writer:
+        columns = [[] for _ in schema]
+        for row in rows:
+            for column, value in zip(columns, row):
+                column.append(value)
+            count += 1
+            if len(columns[0]) >= batch_size:
+                writer.write_batch(columns)
+                columns = [[] for _ in schema]
+        if columns[0]:
+            writer.write_batch(columns)
+    return count
+
+# Row generators for each export
+def sales_rows(branches):
+    for branch in branches:
+        for sale in branch.sales:
+            product = sale.product
+            yield (
+                sale.sale_id, sale.branch_id,
+                product.product_id if product else None, product.category if product else None,
+                sale.quantity, sale.item_price, sale.total_price, sale.date, sale.basket_id
+            )
+
+def monthly_rows(monthly_sales):
+    for branch_id, data in monthly_sales.items():
+        yield (branch_id, data['total_sales_amount'], data['customer_count'],
+               data['sales_volume'], data['average_transaction_value'])
+
+def daily_rows(monthly_sales):
+    for branch_id, data in monthly_sales.items():
+        for date in sorted(data['daily_sales_report']):
+            day = data['daily_sales_report'][date]
+            yield (branch_id, date, day['quantity'], day['revenue'])
+
+def weekly_rows(weekly_sales):
+    for week, data in weekly_sales.items():
+        customer_count = len(data['customer_count'])
+        average = data['total_sales_amount'] / customer_count if customer_count else 0.0
+        yield (week, data['total_sales_amount'], customer_count, average, data['total_quantity'])
+
+def product_rows(products):
+    for rank, (product_id, data) in enumerate(products, start=1):
+        yield (rank, product_id, data['quantity'], data['revenue'])
+
+def price_rows(branches):
+    # Single pass over all sales: count, sum, sum of squares, min and max per product
+    stats = {}
+    for branch in branches:
+        for sale in branch.sales:
+            if sale.product is None:
+                continue
+            price = sale.item_price
+            entry = stats.get(sale.product.product_id)
+            if entry is None:
+                stats[sale.product.product_id] = [1, price, price * price, price, price]
+            else:
+                entry[0] += 1
+                entry[1] += price
+                entry[2] += price * price
+                entry[3] = min(entry[3], price)
+                entry[4] = max(entry[4], price)
+
+    for product_id in sorted(stats):
+        count, total, squares, low, high = stats[product_id]
+        average = total / count
+        variance = max(squares / count - average * average, 0.0)
+        yield (product_id, count, average, variance ** 0.5, low, high)
+
+def export_all(snapshot, output_dir, file_format='csv', month=6, year=2024, batch_size=65536):
+    os.makedirs(output_dir, exist_ok=True)
+    extension = {'csv': '.csv', 'parquet': '.parquet', 'arrow': '.arrow'}[file_format]
+    branches = snapshot.get_branches()
+    monthly_sales = MonthlySalesAnalysis(branches).analyze(month=month, year=year)
+
+    exports = [
+        ('sales', sales_rows(branches), SALES_SCHEMA),
+        ('monthly_sales', monthly_rows(monthly_sales), MONTHLY_SCHEMA),
+        ('daily_sales', daily_rows(monthly_sales), DAILY_SCHEMA),
+        ('weekly_sales', weekly_rows(WeeklySalesAnalysis(branches).analyze(year=year)), WEEKLY_SCHEMA),
+        ('top_products', product_rows(PopularProductsAnalysis(branches).analyze()), PRODUCT_SCHEMA),
+        ('price_stats', price_rows(branches), PRICE_SCHEMA)
+    ]
+    written = {}
+    for name, rows, schema in exports:
+        path = os.path.join(output_dir, name + extension)
+        written[path] = write_rows(rows, path, schema, file_format, batch_size)
+    return written
+
+def main():
+    parser = argparse.ArgumentParser(description='Export cleaned sales and analysis results to columnar files.')
+    parser.add_argument('--output', default='exports')
+    parser.add_argument('--format', choices=['csv', 'parquet', 'arrow'], default='csv')
+    parser.add_argument('--month', type=int, default=6)
+    parser.add_argument('--year', type=int, default=2024)
+    parser.add_argument('--batch-size', type=int, default=65536)
+    args = parser.parse_args()
+
+    db = Database()
+    db.load_data('data/branches.csv', 'data/sales.csv', 'data/products.csv')
+    written = export_all(db.snapshot(), args.output, args.format, args.month, args.year, args.batch_size)
+    for path, count in written.items():
+        print(f"{path}: {count} rows")
+
+if __name__ == "__main__":
+    main()
@@ -1,54 +1,306 @@
 import csv
+import os
+import threading
+import numpy as np
+from types import MappingProxyType
+from approximate_analysis import StratifiedSample
+from sales_columns import SalesColumns
+from sales_validation import SalesValidator, REQUIRED_FIELDS
 from sale import Sale
 from product import Product
 from branch import Branch
 
+# Immutable view of one loaded dataset. Readers hold on to a snapshot for the
+# whole report, reloads publish a new one, and an old snapshot is freed by
+# reference counting once its last reader lets go of it.
+class DatasetSnapshot:
+    def __init__(self, branches=(), products=None, version=0, sample=None, sources=None,
+                 sales_offset=0, sales_fieldnames=None, sale_id_hashes=None, validation=None, sales_file_id=None):
+        self.branches = tuple(branches)
+        self.products = MappingProxyType(dict(products or {}))
+        self.version = version
+        self.sample = sample
+        self.sources = sources
+        self.sales_offset = sales_offset
+        self.sales_fieldnames = sales_fieldnames
+        # Sorted hashes of every loaded sale id, for duplicate checks on append
+        self.sale_id_hashes = sale_id_hashes if sale_id_hashes is not None else np.empty(0, dtype=np.int64)
+        self.validation = validation
+        # (device, inode) of the sales file read, to notice it being replaced
+        self.sales_file_id = sales_file_id
+        self._columns = None
+
+    def replace(self, **changes):
+        fields = {
+            'branches': self.branches,
+            'products': self.products,
+            'version': self.version,
+            'sample': self.sample,
+            'sources': self.sources,
+            'sales_offset': self.sales_offset,
+            'sales_fieldnames': self.sales_fieldnames,
+            'sale_id_hashes': self.sale_id_hashes,
+            'validation': self.validation,
+            'sales_file_id': self.sales_file_id
+        }
+        fields.update(changes)
+        snapshot = DatasetSnapshot(**fields)
+        if 'branches' not in changes:
+            snapshot._columns = self._columns
+        return snapshot
+
+    def columns(self):
+        # Built on first use and shared by every analysis of this snapshot
+        if self._columns is None:
+            self._columns = SalesColumns.from_branches(self.branches)
+        return self._columns
+
+    def get_branches(self):
+        return self.branches
+
+    def get_product(self, product_id):
+        return self.products.get(product_id)
+
 class Database:
     _instance = None
+    _instance_lock = threading.Lock()
+    # Quarantine sales whose total_price disagrees with quantity x item_price
+    # instead of loading them with a warning
+    strict_totals = False
 
     def __new__(cls):
         if cls._instance is None:
-            cls._instance = super(Database, cls).__new__(cls)
-            cls._instance.branches = []
-            cls._instance.products = {}
+            with cls._instance_lock:
+                if cls._instance is None:
+                    instance = super(Database, cls).__new__(cls)
+                    instance._snapshot = DatasetSnapshot()
+                    instance._reload_lock = threading.Lock()
+                    instance._auto_reload = None
+                    instance._ingest_observers = []
+                    cls._instance = instance
         return cls._instance
 
-    def load_data(self, branches_file, sales_file, products_file):
-        self.branches = []
-        self.products = {}
-        self._load_branches(branches_file)
-        self._load_products(products_file)
-        self._load_sales(sales_file)
+    # Readers only dereference the current snapshot, so the hot path takes no
+    # lock. Writers serialize on _reload_lock and publish by rebinding it.
+    def snapshot(self):
+        return self._snapshot
+
+    @property
+    def branches(self):
+        return self._snapshot.branches
+
+    @property
+    def products(self):
+        return self._snapshot.products
+
+    @property
+    def sample(self):
+        return self._snapshot.sample
+
+    @property
+    def version(self):
+        return self._snapshot.version
+
+    # Observers are told about every batch of sales as it is ingested, in
+    # time order, e.g. to check new rows for anomalies
+    def add_ingest_observer(self, observer):
+        if observer not in self._ingest_observers:
+            self._ingest_observers.append(observer)
+
+    def remove_ingest_observer(self, observer):
+        self._ingest_observers.remove(observer)
+
+    def _notify_ingest(self, sales, full_reload, branches):
+        if not self._ingest_observers:
+            return
+        sales = sorted(sales, key=lambda sale: sale.date)
+        for observer in self._ingest_observers:
+            observer.update({'sales': sales, 'full_reload': full_reload, 'branches': branches})
+
+    def load_data(self, branches_file, sales_file, products_file, sample_fraction=None, target_error=None, sales_end=None):
+        # sales_end stops reading at that byte offset, to load exactly what
+        # another process has loaded
+        with self._reload_lock:
+            branches = self._load_branches(branches_file)
+            products = self._load_products(products_file)
+            sales, sales_offset, sales_fieldnames, report, sales_file_id = self._load_sales(
+                sales_file, products, branches, end=sales_end)
+            for branch_id, branch_sales in sales.items():
+                branches[branch_id].sales = branch_sales
+            snapshot = DatasetSnapshot(
+                branches=branches.values(),
+                products=products,
+                version=self._snapshot.version + 1,
+                sources=(branches_file, sales_file, products_file),
+                sales_offset=sales_offset,
+                sales_fieldnames=sales_fieldnames,
+                sale_id_hashes=np.sort(report['clean_id_hashes']),
+                validation=self._validation(report),
+                sales_file_id=sales_file_id
+            )
+            if sample_fraction is not None or target_error is not None:
+                snapshot = snapshot.replace(sample=StratifiedSample.from_branches(
+                    snapshot.branches, fraction=sample_fraction, target_error=target_error))
+            self._snapshot = snapshot
+            self._notify_ingest((sale for branch in snapshot.branches for sale in branch.sales), True, snapshot.branches)
+        return snapshot
+
+    def load_incremental(self, sales_end=None):
+        # Read only the rows appended to the sales file since the last load.
+        # Branches that receive new sales are copied, so readers of the
+        # previous snapshot keep seeing their original sales lists.
+        with self._reload_lock:
+            current = self._snapshot
+            if current.sources is None:
+                raise ValueError("No dataset loaded yet.")
+
+            branch_ids = {branch.branch_id for branch in current.branches}
+            new_sales, sales_offset, _, report, _ = self._load_sales(
+                current.sources[1], current.products, branch_ids,
+                offset=current.sales_offset, end=sales_end, fieldnames=current.sales_fieldnames,
+                known_id_hashes=current.sale_id_hashes,
+                known_ids=lambda: {sale.sale_id for branch in current.branches for sale in branch.sales}
+            )
+            validation = self._validation(report, current.validation)
+            if not any(new_sales.values()):
+                if report['quarantined'] or report['flagged']:
+                    # Rejected rows are not read again
+                    self._snapshot = current.replace(sales_offset=sales_offset, validation=validation)
+                return self._snapshot
+
+            branches = []
+            ingested = []
+            for branch in current.branches:
+                added = new_sales.get(branch.branch_id)
+                if added:
+                    branch = branch.with_sales(branch.sales + added)
+                    ingested.extend(added)
+                branches.append(branch)
+
+            sample = current.sample
+            if sample is not None:
+                sample = sample.extend(SalesColumns.from_sales(ingested))
+            self._snapshot = current.replace(
+                branches=branches, version=current.version + 1,
+                sample=sample, sales_offset=sales_offset,
+                sale_id_hashes=_merge_sorted(current.sale_id_hashes, report['clean_id_hashes']),
+                validation=validation
+            )
+            self._notify_ingest(ingested, False, self._snapshot.branches)
+            return self._snapshot
+
+    def reload(self, incremental=True):
+        current = self._snapshot
+        if current.sources is None:
+            raise ValueError("No dataset loaded yet.")
+        if incremental:
+            return self.load_incremental()
+        sample_fraction = current.sample.fraction if current.sample is not None else None
+        return self.load_data(*current.sources, sample_fraction=sample_fraction)
+
+    def start_auto_reload(self, interval, incremental=True):
+        self.stop_auto_reload()
+        stop = threading.Event()
+
+        def run():
+            while not stop.wait(interval):
+                try:
+                    self.reload(incremental)
+                except (OSError, ValueError) as e:
+                    print(f"Reload failed: {e}")
+
+        thread = threading.Thread(target=run, name='database-reload', daemon=True)
+        self._auto_reload = (thread, stop)
+        thread.start()
+
+    def stop_auto_reload(self):
+        if self._auto_reload is not None:
+            thread, stop = self._auto_reload
+            stop.set()
+            thread.join()
+            self._auto_reload = None
+
+    def build_sample(self, fraction=None, target_error=None):
+        with self._reload_lock:
+            sample = StratifiedSample(self._snapshot.columns(), fraction=fraction, target_error=target_error)
+            self._snapshot = self._snapshot.replace(sample=sample)
+        return sample
 
     def _load_branches(self, file):
+        branches = {}
         with open(file, 'r') as f:
             reader = csv.DictReader(f)
             for row in reader:
                 branch = BranchFactory.create_branch(row)
-                self.branches.append(branch)
+                branches[branch.branch_id] = branch
+        return branches
 
     def _load_products(self, file):
+        products = {}
         with open(file, 'r') as f:
             reader = csv.DictReader(f)
             for row in reader:
                 product = ProductFactory.create_product(row)
-                self.products[product.product_id] = product
+                products[product.product_id] = product
+        return products
 
-    def _load_sales(self, file):
-        with open(file, 'r') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                sale = SaleFactory.create_sale(row, self.products)
-                for branch in self.branches:
-                    if branch.branch_id == sale.branch_id:
-                        branch.add_sale(sale)
-                        break
+    def _load_sales(self, file, products, branch_ids, offset=0, end=None, fieldnames=None, known_id_hashes=None, known_ids=None):
+        # Sales are read as bytes so the offset of the last complete row can be
+        # remembered for incremental loads. A trailing row without a newline
+        # may still be being written, so on full and incremental loads alike it
+        # is left for the next load, which starts at the beginning of that row.
+        consumed = [offset]
+
+        def complete_lines(f):
+            for line in f:
+                if not line.endswith(b'\n') or (end is not None and consumed[0] + len(line) > end):
+                    break
+                consumed[0] += len(line)
+                yield line.decode('utf-8')
+
+        with open(file, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            f.seek(offset)
+            reader = csv.reader(complete_lines(f))
+            if fieldnames is None:
+                fieldnames = next(reader, None)
+            rows = [row for row in reader if row]
+
+        # Rows are validated as a batch; only the clean ones become sales
+        validator = SalesValidator(products, branch_ids, known_id_hashes, known_ids, self.strict_totals)
+        report = validator.validate(fieldnames or REQUIRED_FIELDS, rows)
+        sales = {}
+        for sale in SaleFactory.create_sales(report['clean'], products):
+            sales.setdefault(sale.branch_id, []).append(sale)
+        return sales, consumed[0], fieldnames, report, (stat.st_dev, stat.st_ino)
+
+    def _validation(self, report, previous=None):
+        # Counts and rows rejected or flagged since the last full load, in the
+        # order they were read. Nothing is written or printed here; see
+        # sales_validation.save_quarantine
+        entries = [(row, 'quarantined', reason) for row, reason in report['quarantined']]
+        entries += [(row, 'loaded', reason) for row, reason in report['flagged']]
+        validation = {'rows': report['rows'], 'quarantined': len(report['quarantined']),
+                      'flagged': len(report['flagged']), 'fieldnames': report['fieldnames'], 'entries': entries}
+        if previous is not None:
+            for key in ('rows', 'quarantined', 'flagged', 'entries'):
+                validation[key] = previous[key] + validation[key]
+        validation['loaded'] = validation['rows'] - validation['quarantined']
+        return validation
 
     def get_branches(self):
-        return self.branches
+        return self._snapshot.branches
 
     def get_product(self, product_id):
-        return self.products.get(product_id)
+        return self._snapshot.get_product(product_id)
+
+    def get_sample(self):
+        return self._snapshot.sample
+
+def _merge_sorted(sorted_values, new_values):
+    # Only the new values are sorted; they are then inserted at their places
+    new_values = np.sort(new_values)
+    return np.insert(sorted_values, np.searchsorted(sorted_values, new_values), new_values)
 
 # Factories for creating instances
 class BranchFactory:
@@ -73,14 +325,13 @@ class ProductFactory:
 
 class SaleFactory:
     @staticmethod
-    def create_sale(data, products):
-        product = products.get(data['product_id'])
-        return Sale(
-            sale_id=data['sale_id'],
-            branch_id=data['branch_id'],
-            product=product,
-            quantity=int(data['quantity']),
-            total_price=float(data['total_price']),
-            date=data['date'],
-            item_price=float(data['item_price'])
-        )
+    def create_sales(columns, products):
+        # Builds sales from the parsed columns of validated rows
+        basket_ids = columns['basket_id'] or [None] * len(columns['sale_id'])
+        return [
+            Sale(sale_id, branch_id, products[product_id], quantity, total_price, date, item_price, basket_id)
+            for sale_id, branch_id, product_id, quantity, total_price, date, item_price, basket_id in zip(
+                columns['sale_id'], columns['branch_id'], columns['product_id'], columns['quantity'],
+                columns['total_price'], columns['date'], columns['item_price'], basket_ids
+            )
+        ]
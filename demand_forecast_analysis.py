@@ -0,0 +1,206 @@
+from abc import ABC, abstractmethod
+from statistics import NormalDist
+import numpy as np
+from sales_columns import SalesColumns, weekday_of
+from table_renderer import TableRenderer
+
+MODELS = ('seasonal', 'trend')
+SEASON = 7
+
+# Every (branch, product) pair that has sold at least once becomes one row of
+# a (series x day) matrix of daily quantities, with zeros on days without sales.
+def daily_quantity_matrix(columns):
+    if len(columns) == 0:
+        return [], None, np.zeros((0, 0))
+    days = columns.days()
+    start_day = days.min()
+    day_offsets = (days - start_day).astype(np.int64)
+    n_days = int(day_offsets.max()) + 1
+
+    pair_codes = columns.branch_codes * len(columns.product_ids) + columns.product_codes
+    pairs, series = np.unique(pair_codes, return_inverse=True)
+    matrix = np.bincount(
+        series * n_days + day_offsets,
+        weights=columns.quantity.astype(np.float64),
+        minlength=len(pairs) * n_days
+    ).reshape(len(pairs), n_days)
+    keys = [
+        (columns.branch_ids[pair // len(columns.product_ids)], columns.product_ids[pair % len(columns.product_ids)])
+        for pair in pairs.tolist()
+    ]
+    return keys, start_day, matrix
+
+# Additive weekday-seasonal exponential smoothing in error-correction form,
+# run over the day axis with all series updated together at each step.
+def fit_seasonal_smoothing(matrix, start_weekday=0, horizon=7, alpha=0.3, gamma=0.1, confidence=0.95):
+    n_series, n_days = matrix.shape
+    if n_days < 2 * SEASON:
+        raise ValueError(f"Seasonal smoothing needs at least {2 * SEASON} days of history, got {n_days}.")
+
+    first_week = matrix[:, :SEASON]
+    level = first_week.mean(axis=1)
+    # season[:, w] is the offset for weekday w (Monday = 0)
+    season = np.empty((n_series, SEASON))
+    season[:, (start_weekday + np.arange(SEASON)) % SEASON] = first_week - level[:, None]
+
+    squared_errors = np.zeros(n_series)
+    for t in range(SEASON, n_days):
+        weekday = (start_weekday + t) % SEASON
+        error = matrix[:, t] - (level + season[:, weekday])
+        squared_errors += error * error
+        level += alpha * error
+        season[:, weekday] += gamma * error
+    sigma = np.sqrt(squared_errors / (n_days - SEASON))
+
+    steps = np.arange(1, horizon + 1)
+    weekdays = (start_weekday + n_days - 1 + steps) % SEASON
+    forecast = level[:, None] + season[:, weekdays]
+    # h-step variance is sigma^2 * (1 + sum of squared error weights for steps 1..h-1)
+    weights = alpha + gamma * (np.arange(1, horizon) % SEASON == 0)
+    spread = np.sqrt(1 + np.concatenate([[0.0], np.cumsum(weights ** 2)]))
+    return _with_interval(forecast, sigma[:, None] * spread, confidence)
+
+# Ordinary least squares on an intercept, a linear trend and weekday dummies.
+# The design matrix is the same for every series, so one solve fits them all.
+def fit_linear_trend(matrix, start_weekday=0, horizon=7, confidence=0.95):
+    n_series, n_days = matrix.shape
+    design = _trend_design(np.arange(n_days), start_weekday)
+    if n_days <= design.shape[1]:
+        raise ValueError(f"Linear trend needs more than {design.shape[1]} days of history, got {n_days}.")
+
+    pseudo_inverse = np.linalg.pinv(design)
+    coefficients = pseudo_inverse @ matrix.T
+    residuals = matrix.T - design @ coefficients
+    sigma = np.sqrt((residuals * residuals).sum(axis=0) / (n_days - design.shape[1]))
+
+    future = _trend_design(np.arange(n_days, n_days + horizon), start_weekday)
+    forecast = (future @ coefficients).T
+    # Prediction variance includes the uncertainty of the fitted coefficients
+    leverage = np.einsum('hi,ij,hj->h', future, pseudo_inverse @ pseudo_inverse.T, future)
+    return _with_interval(forecast, sigma[:, None] * np.sqrt(1 + leverage), confidence)
+
+# Repeats the last week (or the whole history, if shorter) forward. Used
+# when there is too little history for the other models.
+def fit_seasonal_naive(matrix, horizon=7, confidence=0.95):
+    n_series, n_days = matrix.shape
+    if n_days == 0:
+        raise ValueError("Seasonal naive forecast needs at least 1 day of history, got 0.")
+    period = min(SEASON, n_days)
+    steps = np.arange(horizon)
+    forecast = matrix[:, n_days - period + steps % period]
+    errors = matrix[:, period:] - matrix[:, :-period]
+    sigma = np.sqrt((errors * errors).mean(axis=1)) if errors.shape[1] else np.zeros(n_series)
+    # Each further period ahead adds one more period's worth of error
+    return _with_interval(forecast, sigma[:, None] * np.sqrt(steps // period + 1), confidence)
+
+def _trend_design(t, start_weekday):
+    weekdays = (start_weekday + t) % SEASON
+    dummies = weekdays[:, None] == np.arange(1, SEASON)
+    return np.column_stack([np.ones(len(t)), t, dummies]).astype(np.float64)
+
+def _with_interval(forecast, scale, confidence):
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    # Demand cannot be negative
+    return {
+        'forecast': np.clip(forecast, 0.0, None),
+        'lower': np.clip(forecast - z * scale, 0.0, None),
+        'upper': np.clip(forecast + z * scale, 0.0, None)
+    }
+
+class ForecastStrategy(ABC):
+    @abstractmethod
+    def analyze(self, branch_id=None, product_id=None):
+        pass
+
+class DemandForecastAnalysis(ForecastStrategy):
+    def __init__(self, branches, model='seasonal', horizon=7, alpha=0.3, gamma=0.1, confidence=0.95, columns=None):
+        if model not in MODELS:
+            raise ValueError(f"Unknown model {model}. Expected one of: {', '.join(MODELS)}.")
+        self.model = model
+        self.horizon = horizon
+        self.alpha = alpha
+        self.gamma = gamma
+        self.confidence = confidence
+        columns = columns if columns is not None else SalesColumns.from_branches(branches)
+        self.keys, self.start_day, self.matrix = daily_quantity_matrix(columns)
+
+    def model_for(self, n_days):
+        # Too short a history for the chosen model falls back to the trend
+        # model, then to the seasonal naive forecast
+        if self.model == 'seasonal' and n_days >= 2 * SEASON:
+            return 'seasonal'
+        if n_days > SEASON + 1:
+            return 'trend'
+        return 'seasonal naive'
+
+    def fit(self, matrix, horizon):
+        if self.start_day is None:
+            raise ValueError("No sales history to forecast from.")
+        start_weekday = int(weekday_of(self.start_day))
+        model = self.model_for(matrix.shape[1])
+        if model == 'seasonal':
+            return fit_seasonal_smoothing(matrix, start_weekday, horizon, self.alpha, self.gamma, self.confidence)
+        if model == 'trend':
+            return fit_linear_trend(matrix, start_weekday, horizon, self.confidence)
+        return fit_seasonal_naive(matrix, horizon, self.confidence)
+
+    def analyze(self, branch_id=None, product_id=None):
+        result = self.fit(self.matrix, self.horizon)
+        first_day = self.start_day + np.timedelta64(self.matrix.shape[1], 'D')
+        selected = [
+            i for i, (branch, product) in enumerate(self.keys)
+            if (branch_id is None or branch == branch_id) and (product_id is None or product == product_id)
+        ]
+        return {
+            'model': self.model_for(self.matrix.shape[1]),
+            'keys': [self.keys[i] for i in selected],
+            'dates': [str(first_day + np.timedelta64(h, 'D')) for h in range(self.horizon)],
+            'forecast': result['forecast'][selected],
+            'lower': result['lower'][selected],
+            'upper': result['upper'][selected]
+        }
+
+    def backtest(self, holdout=None):
+        # Refit on all but the last `holdout` days and score the forecasts of
+        # those days, next to a seasonal naive forecast (same weekday last week)
+        holdout = holdout or self.horizon
+        if self.matrix.shape[1] <= holdout:
+            raise ValueError(f"Backtest needs more than {holdout} days of history, got {self.matrix.shape[1]}.")
+        history, actual = self.matrix[:, :-holdout], self.matrix[:, -holdout:]
+        result = self.fit(history, holdout)
+        errors = result['forecast'] - actual
+        naive = fit_seasonal_naive(history, holdout)['forecast']
+        total = actual.sum()
+        return {
+            'model': self.model_for(history.shape[1]),
+            'holdout': holdout,
+            'series': len(self.keys),
+            'mae': float(np.abs(errors).mean()),
+            'rmse': float(np.sqrt((errors * errors).mean())),
+            'wape': float(np.abs(errors).sum() / total) if total else 0.0,
+            'bias': float(errors.mean()),
+            'coverage': float(((actual >= result['lower']) & (actual <= result['upper'])).mean()),
+            'naive_mae': float(np.abs(naive - actual).mean())
+        }
+
+def print_forecast_table(forecast, top=20):
+    # Series with the largest total forecast demand first
+    order = np.argsort(-forecast['forecast'].sum(axis=1))[:top]
+    TableRenderer(["Branch ID", "Product ID"] + forecast['dates']).render(
+        (
+            list(forecast['keys'][i]) + [
+                f"{value:.1f} [{low:.1f}, {high:.1f}]"
+                for value, low, high in zip(forecast['forecast'][i], forecast['lower'][i], forecast['upper'][i])
+            ]
+            for i in order
+        )
+    )
+
+def print_backtest_table(results):
+    TableRenderer(["Model", "Holdout Days", "Series", "MAE", "RMSE", "WAPE", "Bias", "Interval Coverage", "Seasonal Naive MAE"]).render(
+        (
+            (r['model'], r['holdout'], r['series'], f"{r['mae']:.2f}", f"{r['rmse']:.2f}", f"{r['wape']:.1%}",
+             f"{r['bias']:.2f}", f"{r['coverage']:.1%}", f"{r['naive_mae']:.2f}")
+            for r in results
+        )
+    )
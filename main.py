@@ -1,4 +1,6 @@
+import argparse
 import csv
+import threading
 from datetime import datetime
 from abc import ABC, abstractmethod
 from database import Database
@@ -12,22 +14,50 @@ from product_price_analysis import (
     print_price_analysis_table, plot_price_variation
 )
 from weekly_sales_analysis import WeeklySalesAnalysis, WeeklySalesPlotter
-from product_preference_analysis import PopularProductsAnalysis, print_popular_products_table, plot_popular_products
+from product_preference_analysis import (
+    PopularProductsAnalysis, CoPurchaseAnalysis, print_popular_products_table,
+    plot_popular_products, print_co_purchase_table
+)
 from sales_distribution_analysis import sales_distribution_analysis
+from sales_heatmap_analysis import BranchHourWeekdayAnalysis, plot_sales_heatmap
+from daily_series import DailySalesSeries
+from anomaly_detection import SalesAnomalyDetector, filter_anomalies, print_anomalies_table
+from branch_comparison_analysis import (
+    BranchComparisonAnalysis, print_branch_comparison_table, print_branch_similarity_table
+)
+from demand_forecast_analysis import DemandForecastAnalysis, MODELS, print_forecast_table, print_backtest_table
+from sales_validation import save_quarantine
+from table_renderer import configure as configure_tables, render_table
+from sales_dashboard import run_dashboard, configure as configure_dashboard
+from approximate_analysis import (
+    ApproximateMonthlySalesAnalysis, ApproximateWeeklySalesAnalysis,
+    ApproximatePopularProductsAnalysis, approximate_sales_distribution_analysis,
+    format_figure
+)
 
 # Singleton Pattern for Database
 class DatabaseSingleton:
     _instance = None
+    _lock = threading.Lock()
 
     def __new__(cls):
         if cls._instance is None:
-            cls._instance = super().__new__(cls)
-            cls._instance.db = Database()
+            with cls._lock:
+                if cls._instance is None:
+                    instance = super().__new__(cls)
+                    instance.db = Database()
+                    cls._instance = instance
         return cls._instance
 
     def get_database(self):
         return self._instance.db
 
+# Flags price and daily volume outliers as sales are loaded
+anomaly_detector = SalesAnomalyDetector()
+
+# Cumulative daily totals kept up to date as sales are loaded
+daily_series = DailySalesSeries()
+
 # Factory Method Pattern for Analysis
 class AnalysisFactory(ABC):
     @abstractmethod
@@ -36,8 +66,8 @@ class AnalysisFactory(ABC):
 
 class MonthlySalesAnalysisFactory(AnalysisFactory):
     def create_analysis(self):
+        # main_menu has loaded the data; use the current snapshot
         db = DatabaseSingleton().get_database()
-        db.load_data('data/branches.csv', 'data/sales.csv', 'data/products.csv')
         return MonthlySalesAnalysis(db.get_branches())
 
 # Strategy Pattern for Analysis Types
@@ -106,9 +136,25 @@ def display_analysis_options():
     print("\n--- Monthly Sales Analysis ---")
     print("1. For All Branches")
     print("2. For Specific Branch")
-    print("3. Return to Main Menu")
+    print("3. Compare Branches")
+    print("4. Date Range Totals")
+    print("5. Weekday and Hour Heatmap")
+    print("6. Return to Main Menu")
     return input("Please select an option: ")
 
+def print_date_range_totals(series, branch_id, start, end):
+    try:
+        rows = [
+            (metric.capitalize(), f"{series.total('branch', branch_id, start, end, metric):.2f}",
+             f"{series.average('branch', branch_id, start, end, metric):.2f}")
+            for metric in ('revenue', 'quantity', 'transactions')
+        ]
+    except ValueError as e:
+        print(e)
+        return
+    print(f"\nBranch {branch_id} from {start} to {end}:")
+    print_table(headers=["Metric", "Total", "Daily Average"], rows=rows)
+
 def perform_monthly_sales_analysis(factory):
     analysis = factory.create_analysis()
     notifier = SalesReportNotifier()
@@ -138,19 +184,19 @@ def perform_monthly_sales_analysis(factory):
                 print("Top-Selling Products:")
                 print_table(
                     headers=["Product ID", "Sales Quantity", "Revenue"],
-                    rows=[(pid, info['quantity'], info['revenue']) for pid, info in data['top_selling_products']]
+                    rows=((pid, info['quantity'], info['revenue']) for pid, info in data['top_selling_products'])
                 )
 
                 print("\nLow-Selling Products:")
                 print_table(
                     headers=["Product ID", "Sales Quantity", "Revenue"],
-                    rows=[(pid, info['quantity'], info['revenue']) for pid, info in data['low_selling_products']]
+                    rows=((pid, info['quantity'], info['revenue']) for pid, info in data['low_selling_products'])
                 )
 
                 print("\nSales by Product Category:")
                 print_table(
                     headers=["Category", "Quantity", "Revenue"],
-                    rows=[(category, info['quantity'], info['revenue']) for category, info in data['sales_by_product_category'].items()]
+                    rows=((category, info['quantity'], info['revenue']) for category, info in data['sales_by_product_category'].items())
                 )
 
             notifier.notify_observers({
@@ -172,19 +218,19 @@ def perform_monthly_sales_analysis(factory):
                 print("Top-Selling Products:")
                 print_table(
                     headers=["Product ID", "Sales Quantity", "Revenue"],
-                    rows=[(pid, info['quantity'], info['revenue']) for pid, info in branch_data['top_selling_products']]
+                    rows=((pid, info['quantity'], info['revenue']) for pid, info in branch_data['top_selling_products'])
                 )
 
                 print("\nLow-Selling Products:")
                 print_table(
                     headers=["Product ID", "Sales Quantity", "Revenue"],
-                    rows=[(pid, info['quantity'], info['revenue']) for pid, info in branch_data['low_selling_products']]
+                    rows=((pid, info['quantity'], info['revenue']) for pid, info in branch_data['low_selling_products'])
                 )
 
                 print("\nSales by Product Category:")
                 print_table(
                     headers=["Category", "Quantity", "Revenue"],
-                    rows=[(category, info['quantity'], info['revenue']) for category, info in branch_data['sales_by_product_category'].items()]
+                    rows=((category, info['quantity'], info['revenue']) for category, info in branch_data['sales_by_product_category'].items())
                 )
 
                 plot_specific_branch_daily_sales_report(branch_data['daily_sales_report'], branch_id)
@@ -194,15 +240,170 @@ def perform_monthly_sales_analysis(factory):
                 print("Branch ID not found. Please try again.")
 
         elif choice == '3':
+            snapshot = DatabaseSingleton().get_database().snapshot()
+            for dimension, label in (('category', 'Category'), ('product', 'Product')):
+                comparison = BranchComparisonAnalysis(snapshot.branches, dimension=dimension, columns=snapshot.columns()).analyze(month=6, year=2024)
+                print(f"\nRevenue by {label} (share of all branches):")
+                print_branch_comparison_table(comparison)
+
+            branch_id = input("Enter Branch ID for similar branches (blank for all branches): ").strip()
+            if branch_id and branch_id not in comparison['branches']:
+                print("Branch ID not found. Please try again.")
+            else:
+                print("\nMost Similar Branches (cosine, by product revenue):")
+                print_branch_similarity_table(comparison, [branch_id] if branch_id else None)
+
+        elif choice == '4':
+            branch_id = input("Enter Branch ID: ")
+            start = input("Enter start date (YYYY-MM-DD): ")
+            end = input("Enter end date (YYYY-MM-DD): ")
+            print_date_range_totals(daily_series, branch_id, start, end)
+
+        elif choice == '5':
+            branch_id = input("Enter Branch ID (blank for all branches): ").strip() or None
+            start = input("Enter start date (YYYY-MM-DD, blank for first sale): ").strip() or None
+            end = input("Enter end date (YYYY-MM-DD, blank for last sale): ").strip() or None
+            metric = input("Enter metric (quantity, revenue or transactions): ").strip() or 'quantity'
+            try:
+                snapshot = DatabaseSingleton().get_database().snapshot()
+                heatmap = BranchHourWeekdayAnalysis(snapshot.branches, columns=snapshot.columns()).analyze(start, end)
+                plot_sales_heatmap(heatmap, metric, branch_id)
+            except ValueError as e:
+                print(e)
+
+        elif choice == '6':
+            return
+
+        else:
+            print("Invalid choice. Please try again.")
+
+def display_approximate_options():
+    print("\n--- Approximate Analysis ---")
+    print("1. Monthly Sales Analysis")
+    print("2. Weekly Sales Analysis")
+    print("3. Product Preference Analysis")
+    print("4. Sales Distribution Analysis")
+    print("5. Resample")
+    print("6. Return to Main Menu")
+    return input("Please select an option: ")
+
+def request_sample(db):
+    print("\n--- Sample Size ---")
+    print("1. Target Sample Fraction")
+    print("2. Target Relative Error")
+    choice = input("Please select an option: ")
+    try:
+        if choice == '1':
+            return db.build_sample(fraction=float(input("Enter sample fraction (e.g. 0.05): ")))
+        elif choice == '2':
+            return db.build_sample(target_error=float(input("Enter relative error (e.g. 0.02): ")))
+    except ValueError:
+        pass
+    print("Invalid sample size. Please try again.")
+    return None
+
+def perform_approximate_analysis(db):
+    sample = db.get_sample()
+    while sample is None:
+        sample = request_sample(db)
+    print(f"Using {len(sample)} of {sample.population} sales ({sample.fraction:.2%}), {sample.confidence:.0%} confidence intervals.")
+
+    while True:
+        choice = display_approximate_options()
+
+        if choice == '1':
+            monthly_sales = ApproximateMonthlySalesAnalysis(sample).analyze(month=6, year=2024)
+            for branch_id, data in monthly_sales.items():
+                print(f"\nBranch ID: {branch_id}")
+                print(f"Total Sales Amount: {format_figure(data['total_sales_amount'])}")
+                print(f"Customer Count: {format_figure(data['customer_count'])}")
+                print(f"Sales Volume: {format_figure(data['sales_volume'])}")
+                print(f"Average Transaction Value: {format_figure(data['average_transaction_value'])}\n")
+
+                print("Top-Selling Products:")
+                print_table(
+                    headers=["Product ID", "Sales Quantity", "Revenue"],
+                    rows=[(pid, format_figure(info['quantity']), format_figure(info['revenue'])) for pid, info in data['top_selling_products']]
+                )
+        elif choice == '2':
+            weekly_sales = ApproximateWeeklySalesAnalysis(sample).analyze(year=2024)
+            render_table(
+                headers=["Week", "Total Sales Amount", "Customer Count", "Sales Volume"],
+                rows=[(week, format_figure(data['total_sales_amount']), format_figure(data['customer_count']), format_figure(data['total_quantity']))
+                      for week, data in weekly_sales.items()]
+            )
+        elif choice == '3':
+            popular_products = ApproximatePopularProductsAnalysis(sample).analyze()
+            print_table(
+                headers=["Product ID", "Quantity Sold", "Total Revenue"],
+                rows=[(pid, format_figure(info['quantity']), format_figure(info['revenue'])) for pid, info in popular_products]
+            )
+        elif choice == '4':
+            approximate_sales_distribution_analysis(sample)
+        elif choice == '5':
+            sample = request_sample(db) or sample
+        elif choice == '6':
             return
+        else:
+            print("Invalid choice. Please try again.")
 
+def display_forecast_options():
+    print("\n--- Demand Forecast ---")
+    print("1. Forecast All Branches")
+    print("2. Forecast Specific Branch")
+    print("3. Backtest Models")
+    print("4. Return to Main Menu")
+    return input("Please select an option: ")
+
+def perform_demand_forecast(db):
+    while True:
+        choice = display_forecast_options()
+
+        if choice == '1':
+            try:
+                print_forecast_table(DemandForecastAnalysis(None, columns=db.snapshot().columns()).analyze())
+            except ValueError as e:
+                print(e)
+        elif choice == '2':
+            branch_id = input("Enter Branch ID: ")
+            try:
+                forecast = DemandForecastAnalysis(None, columns=db.snapshot().columns()).analyze(branch_id=branch_id)
+            except ValueError as e:
+                print(e)
+            else:
+                if forecast['keys']:
+                    print_forecast_table(forecast)
+                else:
+                    print(f"No sales history for branch {branch_id}.")
+        elif choice == '3':
+            columns = db.snapshot().columns()
+            try:
+                print_backtest_table([DemandForecastAnalysis(None, model=model, columns=columns).backtest() for model in MODELS])
+            except ValueError as e:
+                print(e)
+        elif choice == '4':
+            return
         else:
             print("Invalid choice. Please try again.")
 
+def report_validation(snapshot):
+    # Written and printed once at startup, not on every reload, so background
+    # reloads and the live dashboard stay quiet
+    validation = snapshot.validation
+    if validation is None:
+        return
+    path = save_quarantine(snapshot.sources[1], validation)
+    if path:
+        print(f"Quarantined {validation['quarantined']} of {validation['rows']} sales rows "
+              f"and loaded {validation['flagged']} with warnings, see {path}")
+
 def main_menu(auth, user):
     # Ensure the database is loaded before any analysis
     db = DatabaseSingleton().get_database()
+    db.add_ingest_observer(anomaly_detector)
+    db.add_ingest_observer(daily_series)
     db.load_data('data/branches.csv', 'data/sales.csv', 'data/products.csv')
+    report_validation(db.snapshot())
     
     while True:
         print("\n--- Menu ---")
@@ -213,6 +414,9 @@ def main_menu(auth, user):
         print("5. Weekly Sales Analysis")
         print("6. Logout")
         print("7. Exit")
+        print("8. Approximate Analysis")
+        print("9. Demand Forecast")
+        print("10. Live Dashboard")
 
         choice = input("Please select an option: ")
 
@@ -221,23 +425,31 @@ def main_menu(auth, user):
             perform_monthly_sales_analysis(factory)
         elif choice == '2':
             product_id = input("Enter Product ID: ")
-            avg_price_strategy = AverageSellingPriceAnalysis()
+            snapshot = db.snapshot()
+            avg_price_strategy = AverageSellingPriceAnalysis(snapshot)
             avg_price = avg_price_strategy.analyze(product_id)
             
-            price_variation_strategy = PriceVariationAnalysis()
+            price_variation_strategy = PriceVariationAnalysis(snapshot)
             price_variation = price_variation_strategy.analyze(product_id)
             
             print_price_analysis_table(product_id, avg_price, price_variation)
 
-            # fetch prices from the database again for plotting
-            prices = [sale.item_price for branch in db.get_branches() for sale in branch.sales if sale.product.product_id == product_id]
+            # fetch prices from the same snapshot for plotting
+            prices = [sale.item_price for branch in snapshot.get_branches() for sale in branch.sales if sale.product.product_id == product_id]
             plot_price_variation(prices)
+
+            print("\nPrice and Volume Anomalies:")
+            print_anomalies_table(filter_anomalies(anomaly_detector.anomalies, product_id))
         elif choice == '3':
             branches = db.get_branches()
             strategy = PopularProductsAnalysis(branches)
             popular_products = strategy.analyze()
             print_popular_products_table(popular_products)
             plot_popular_products(popular_products)
+
+            co_purchase = CoPurchaseAnalysis(branches).analyze()
+            print("\nFrequently Bought Together:")
+            print_co_purchase_table(co_purchase)
         elif choice == '4':
             sales_distribution_analysis()
         elif choice == '5':
@@ -258,6 +470,12 @@ def main_menu(auth, user):
         elif choice == '7':
             print("Exiting the program. Goodbye!")
             return True  # Exit the program
+        elif choice == '8':
+            perform_approximate_analysis(db)
+        elif choice == '9':
+            perform_demand_forecast(db)
+        elif choice == '10':
+            run_dashboard(db)
         else:
             print("Invalid choice. Please try again.")
 
@@ -277,7 +495,18 @@ def welcome_screen():
         else:
             print("Invalid choice. Please try again.")
 
-def main():
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Sales Analyzer')
+    parser.add_argument('--limit', type=int, default=None, help='maximum weeks to show in the weekly reports')
+    parser.add_argument('--offset', type=int, default=0, help='weeks to skip before the first one shown')
+    parser.add_argument('--page-size', type=int, default=None, help='pause after this many weeks')
+    parser.add_argument('--refresh', type=float, default=2.0, help='live dashboard refresh interval in seconds')
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    configure_tables(limit=args.limit, offset=args.offset, page_size=args.page_size)
+    configure_dashboard(refresh=args.refresh)
     auth = Authentication()
 
     while True:
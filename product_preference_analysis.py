@@ -1,5 +1,10 @@
 from abc import ABC, abstractmethod
+from array import array
+from itertools import combinations
+import numpy as np
+from scipy import sparse
 from prettytable import PrettyTable
+from table_renderer import TableRenderer
 import matplotlib.pyplot as plt
 
 class ProductPreferenceAnalysisStrategy(ABC):
@@ -26,6 +31,144 @@ class PopularProductsAnalysis(ProductPreferenceAnalysisStrategy):
 
         return top_products
 
+# Market-basket analysis. Baskets are grouped by (branch_id, basket_id) when the
+# sales carry a basket id, otherwise by (branch_id, timestamp). Each basket is
+# one row of a sparse basket x product matrix, so memory grows with the number
+# of (basket, product) pairs and not with the size of the catalogue.
+class CoPurchaseAnalysis(ProductPreferenceAnalysisStrategy):
+    def __init__(self, branches, min_support=0.01, min_confidence=0.2, max_itemset_size=3, chunk_size=50000):
+        self.branches = branches
+        self.min_support = min_support
+        self.min_confidence = min_confidence
+        self.max_itemset_size = max_itemset_size
+        self.chunk_size = chunk_size
+
+    def analyze(self):
+        product_ids, baskets = self._build_baskets()
+        basket_count = baskets.shape[0]
+        if basket_count == 0:
+            return {'basket_count': 0, 'itemsets': [], 'rules': []}
+
+        min_count = self.min_support * basket_count
+        item_counts = np.bincount(baskets.indices, minlength=len(product_ids))
+        frequent_items = np.flatnonzero(item_counts >= min_count)
+
+        supports = {(int(item),): int(item_counts[item]) for item in frequent_items}
+        level = [(int(item),) for item in frequent_items]
+        size = 2
+        while level and size <= self.max_itemset_size:
+            candidates = self._candidates(level, supports)
+            if not candidates:
+                break
+            counts = self._count_candidates(candidates, baskets)
+            level = [candidate for candidate, count in zip(candidates, counts) if count >= min_count]
+            for candidate, count in zip(candidates, counts):
+                if count >= min_count:
+                    supports[candidate] = int(count)
+            size += 1
+
+        itemsets = [
+            {'products': tuple(product_ids[i] for i in itemset), 'support': count / basket_count}
+            for itemset, count in supports.items()
+        ]
+        itemsets.sort(key=lambda x: x['support'], reverse=True)
+
+        return {
+            'basket_count': basket_count,
+            'itemsets': itemsets,
+            'rules': self._rules(supports, product_ids, basket_count)
+        }
+
+    def _build_baskets(self):
+        # (basket row, product) pairs are collected in compact arrays and turned
+        # into a binary CSR matrix; basket keys are only held per branch
+        product_index = {}
+        rows, items = array('q'), array('q')
+        basket_count = 0
+        for branch in self.branches:
+            baskets = {}
+            for sale in branch.sales:
+                if sale.product is None:
+                    continue
+                key = sale.basket_id if sale.basket_id is not None else sale.date
+                row = baskets.get(key)
+                if row is None:
+                    row = baskets[key] = basket_count + len(baskets)
+                rows.append(row)
+                items.append(product_index.setdefault(sale.product.product_id, len(product_index)))
+            basket_count += len(baskets)
+
+        matrix = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.int32), (np.array(rows, dtype=np.int64), np.array(items, dtype=np.int64))),
+            shape=(basket_count, len(product_index))
+        )
+        # A product bought twice in one basket still counts once
+        matrix.data[:] = 1
+        return list(product_index), matrix
+
+    def _chunks(self, baskets, columns):
+        # Only the columns of items in a candidate are kept, then rows are
+        # streamed in chunks so intermediate products stay small
+        selected = baskets[:, columns]
+        for start in range(0, selected.shape[0], self.chunk_size):
+            yield selected[start:start + self.chunk_size]
+
+    def _candidates(self, level, supports):
+        # Apriori join: extend each frequent itemset with a larger frequent item,
+        # keeping only candidates whose every subset is frequent
+        items = sorted({itemset[0] for itemset in supports if len(itemset) == 1})
+        candidates = []
+        for itemset in level:
+            for item in items:
+                if item <= itemset[-1]:
+                    continue
+                candidate = itemset + (item,)
+                if all(subset in supports for subset in combinations(candidate, len(candidate) - 1)):
+                    candidates.append(candidate)
+        return candidates
+
+    def _count_candidates(self, candidates, baskets):
+        columns = sorted({item for candidate in candidates for item in candidate})
+        position = {item: i for i, item in enumerate(columns)}
+        index = np.array([[position[item] for item in candidate] for candidate in candidates])
+        size = index.shape[1]
+        counts = np.zeros(len(candidates), dtype=np.int64)
+        if size > 2:
+            # Column j marks the items of candidate j; a basket contains the
+            # candidate when it hits all of them
+            membership = sparse.csr_matrix(
+                (np.ones(index.size, dtype=np.int32), (index.ravel(), np.repeat(np.arange(len(candidates)), size))),
+                shape=(len(columns), len(candidates))
+            )
+        for chunk in self._chunks(baskets, columns):
+            if size == 2:
+                pairs = (chunk.T @ chunk).tocsr()
+                counts += np.asarray(pairs[index[:, 0], index[:, 1]]).ravel()
+            else:
+                hits = (chunk @ membership).tocsr()
+                counts += np.bincount(hits.indices[hits.data == size], minlength=len(candidates))
+        return counts
+
+    def _rules(self, supports, product_ids, basket_count):
+        rules = []
+        for itemset, count in supports.items():
+            if len(itemset) < 2:
+                continue
+            for consequent in itemset:
+                antecedent = tuple(item for item in itemset if item != consequent)
+                confidence = count / supports[antecedent]
+                if confidence < self.min_confidence:
+                    continue
+                rules.append({
+                    'antecedent': tuple(product_ids[i] for i in antecedent),
+                    'consequent': product_ids[consequent],
+                    'support': count / basket_count,
+                    'confidence': confidence,
+                    'lift': confidence / (supports[(consequent,)] / basket_count)
+                })
+        rules.sort(key=lambda x: (x['lift'], x['confidence']), reverse=True)
+        return rules
+
 def print_popular_products_table(popular_products):
     table = PrettyTable()
     table.field_names = ["Product ID", "Quantity Sold", "Total Revenue"]
@@ -46,3 +189,13 @@ def plot_popular_products(popular_products):
     plt.grid(True)
     plt.tight_layout()
     plt.show()
+
+def print_co_purchase_table(co_purchase):
+    print(f"Baskets analysed: {co_purchase['basket_count']}")
+    TableRenderer(["Antecedent", "Consequent", "Support", "Confidence", "Lift"]).render(
+        (
+            (", ".join(rule['antecedent']), rule['consequent'],
+             f"{rule['support']:.4f}", f"{rule['confidence']:.2f}", f"{rule['lift']:.2f}")
+            for rule in co_purchase['rules']
+        )
+    )
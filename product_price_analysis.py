@@ -1,7 +1,9 @@
 from abc import ABC, abstractmethod
+import numpy as np
 import matplotlib.pyplot as plt
 from prettytable import PrettyTable
 from database import Database
+from chart_cache import chart_cache
 
 class ProductPriceAnalysisStrategy(ABC):
     @abstractmethod
@@ -9,25 +11,31 @@ class ProductPriceAnalysisStrategy(ABC):
         pass
 
 class AverageSellingPriceAnalysis(ProductPriceAnalysisStrategy):
+    def __init__(self, snapshot=None):
+        self.snapshot = snapshot
+
     def analyze(self, product_id):
-        db = Database()
-        product = db.get_product(product_id)
+        snapshot = self.snapshot or Database().snapshot()
+        product = snapshot.get_product(product_id)
         if not product:
             raise ValueError(f"Product ID {product_id} not found.")
         
-        prices = [sale.item_price for branch in db.get_branches() for sale in branch.sales if sale.product.product_id == product_id]
+        prices = [sale.item_price for branch in snapshot.get_branches() for sale in branch.sales if sale.product.product_id == product_id]
         avg_price = sum(prices) / len(prices) if prices else 0.0
 
         return avg_price
 
 class PriceVariationAnalysis(ProductPriceAnalysisStrategy):
+    def __init__(self, snapshot=None):
+        self.snapshot = snapshot
+
     def analyze(self, product_id):
-        db = Database()
-        product = db.get_product(product_id)
+        snapshot = self.snapshot or Database().snapshot()
+        product = snapshot.get_product(product_id)
         if not product:
             raise ValueError(f"Product ID {product_id} not found.")
         
-        prices = [sale.item_price for branch in db.get_branches() for sale in branch.sales if sale.product.product_id == product_id]
+        prices = [sale.item_price for branch in snapshot.get_branches() for sale in branch.sales if sale.product.product_id == product_id]
         if not prices:
             return 0.0
 
@@ -44,11 +52,16 @@ def print_price_analysis_table(product_id, avg_price, price_variation):
     print(table)
 
 def plot_price_variation(prices):
-    plt.figure(figsize=(12, 6))
-    plt.hist(prices, bins=30, edgecolor='black')
-    plt.title('Price Variation Distribution')
-    plt.xlabel('Price')
-    plt.ylabel('Frequency')
-    plt.grid(True)
-    plt.tight_layout()
-    plt.show()
+    # Bin once with NumPy and draw the counts, instead of handing matplotlib every price
+    counts, edges = np.histogram(prices, bins=30)
+    data = {'counts': counts.tolist(), 'edges': edges.tolist()}
+
+    def draw():
+        plt.hist(edges[:-1], bins=edges, weights=counts, edgecolor='black')
+        plt.title('Price Variation Distribution')
+        plt.xlabel('Price')
+        plt.ylabel('Frequency')
+        plt.grid(True)
+        plt.tight_layout()
+
+    chart_cache.render('price_variation', data, {'figsize': (12, 6)}, draw)
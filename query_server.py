@@ -0,0 +1,260 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import urlsplit, parse_qsl
+from database import Database
+from sales_analysis import MonthlySalesAnalysis
+from weekly_sales_analysis import WeeklySalesAnalysis
+from product_price_analysis import AverageSellingPriceAnalysis, PriceVariationAnalysis
+from product_preference_analysis import PopularProductsAnalysis
+from sales_distribution_analysis import compute_sales_distribution
+
+# Endpoint handlers run in the worker pool against one dataset snapshot and
+# return plain JSON-serializable data.
+def _product_rows(products):
+    return [{'product_id': pid, 'quantity': info['quantity'], 'revenue': info['revenue']} for pid, info in products]
+
+def monthly_query(snapshot, params):
+    month = int(params.get('month', 6))
+    year = int(params.get('year', 2024))
+    analysis = MonthlySalesAnalysis(snapshot.get_branches()).analyze(month=month, year=year)
+    branch_id = params.get('branch_id')
+    if branch_id is not None:
+        if branch_id not in analysis:
+            raise ValueError(f"Branch ID {branch_id} not found.")
+        analysis = {branch_id: analysis[branch_id]}
+
+    return {
+        branch_id: {
+            'total_sales_amount': data['total_sales_amount'],
+            'customer_count': data['customer_count'],
+            'sales_volume': data['sales_volume'],
+            'average_transaction_value': data['average_transaction_value'],
+            'top_selling_products': _product_rows(data['top_selling_products']),
+            'low_selling_products': _product_rows(data['low_selling_products']),
+            'sales_by_product_category': dict(data['sales_by_product_category']),
+            'daily_sales_report': dict(data['daily_sales_report']),
+            'hourly_sales_report': dict(data['hourly_sales_report'])
+        }
+        for branch_id, data in analysis.items()
+    }
+
+def weekly_query(snapshot, params):
+    year = int(params.get('year', 2024))
+    weekly_sales = WeeklySalesAnalysis(snapshot.get_branches()).analyze(year=year)
+    result = {}
+    for week, data in weekly_sales.items():
+        customer_count = len(data['customer_count'])
+        products = sorted(data['products'].items(), key=lambda x: x[1]['quantity'], reverse=True)
+        result[week] = {
+            'total_sales_amount': data['total_sales_amount'],
+            'customer_count': customer_count,
+            'average_transaction_value': data['total_sales_amount'] / customer_count if customer_count else 0.0,
+            'total_quantity': data['total_quantity'],
+            'top_selling_products': _product_rows(products[:10]),
+            'low_selling_products': _product_rows(products[-10:])
+        }
+    return result
+
+def price_query(snapshot, params):
+    product_id = params.get('product_id')
+    if product_id is None:
+        raise ValueError("product_id is required.")
+    return {
+        'product_id': product_id,
+        'average_selling_price': AverageSellingPriceAnalysis(snapshot).analyze(product_id),
+        'price_variation': PriceVariationAnalysis(snapshot).analyze(product_id)
+    }
+
+def popular_query(snapshot, params):
+    return _product_rows(PopularProductsAnalysis(snapshot.get_branches()).analyze())
+
+def distribution_query(snapshot, params):
+    return compute_sales_distribution(snapshot.get_branches()) or {'count': 0}
+
+def version_query(snapshot, params):
+    return {'version': snapshot.version}
+
+ENDPOINTS = {
+    '/monthly': monthly_query,
+    '/weekly': weekly_query,
+    '/price': price_query,
+    '/popular': popular_query,
+    '/distribution': distribution_query,
+    '/version': version_query
+}
+
+# Worker processes each hold their own copy of the dataset, so memory grows
+# with the number of workers. A worker reads the sales file only up to the
+# byte offset of the server's snapshot and only ever moves forward, so every
+# query is answered from exactly the rows the server is serving.
+def _init_worker(sources, sales_offset):
+    Database().load_data(*sources, sales_end=sales_offset)
+
+def _worker_query(path, params, sources, sales_offset, sales_file_id, version):
+    db = Database()
+    current = db.snapshot()
+    if (current.sources != sources or current.sales_file_id != sales_file_id
+            or current.sales_offset > sales_offset):
+        # The server loaded a replaced or rewritten file from scratch
+        current = db.load_data(*sources, sales_end=sales_offset)
+    elif current.sales_offset < sales_offset:
+        current = db.load_incremental(sales_end=sales_offset)
+    return json.dumps(ENDPOINTS[path](current.replace(version=version), params)).encode('utf-8')
+
+def create_process_pool(db, workers=None):
+    # Spawned rather than forked, so a worker never inherits a lock held by
+    # the auto-reload thread
+    snapshot = db.snapshot()
+    return ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+        initializer=_init_worker, initargs=(snapshot.sources, snapshot.sales_offset)
+    )
+
+# Serves the analyses over HTTP/JSON from a resident Database. Identical
+# queries that are already running share one computation, and finished
+# responses are cached until the dataset version changes.
+class QueryService:
+    def __init__(self, db, executor=None, cache_size=256):
+        self.db = db
+        self.executor = executor or ThreadPoolExecutor()
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._cache_version = None
+        self._in_flight = {}
+
+    async def query(self, path, params):
+        handler = ENDPOINTS.get(path)
+        if handler is None:
+            raise LookupError(f"Unknown endpoint {path}.")
+
+        snapshot = self.db.snapshot()
+        if snapshot.version != self._cache_version:
+            self._cache.clear()
+            self._cache_version = snapshot.version
+
+        key = (snapshot.version, path, tuple(sorted(params.items())))
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+        future = self._in_flight.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            if isinstance(self.executor, ProcessPoolExecutor):
+                # The aggregations are pure Python, so only separate processes
+                # let them run in parallel; snapshots stay in their own process
+                future = loop.run_in_executor(
+                    self.executor, _worker_query, path, params,
+                    snapshot.sources, snapshot.sales_offset, snapshot.sales_file_id, snapshot.version
+                )
+            else:
+                future = loop.run_in_executor(self.executor, self._run, handler, snapshot, params)
+            self._in_flight[key] = future
+            future.add_done_callback(lambda _: self._finish(key, future))
+        return await asyncio.shield(future)
+
+    def _run(self, handler, snapshot, params):
+        return json.dumps(handler(snapshot, params)).encode('utf-8')
+
+    def _finish(self, key, future):
+        self._in_flight.pop(key, None)
+        if future.cancelled() or future.exception() is not None:
+            return
+        if key[0] == self._cache_version:
+            self._cache[key] = future.result()
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    async def respond(self, method, target):
+        if method != 'GET':
+            return HTTPStatus.METHOD_NOT_ALLOWED, _error("Only GET is supported.")
+        url = urlsplit(target)
+        try:
+            return HTTPStatus.OK, await self.query(url.path, dict(parse_qsl(url.query)))
+        except LookupError as e:
+            return HTTPStatus.NOT_FOUND, _error(str(e))
+        except ValueError as e:
+            return HTTPStatus.BAD_REQUEST, _error(str(e))
+        except Exception as e:
+            return HTTPStatus.INTERNAL_SERVER_ERROR, _error(str(e))
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                parts = request_line.decode('latin-1').split()
+                if len(parts) != 3:
+                    await _write_response(writer, HTTPStatus.BAD_REQUEST, _error("Malformed request."), False)
+                    break
+                method, target, version = parts
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+
+                status, body = await self.respond(method, target)
+                await _write_response(writer, status, body, keep_alive)
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+def _error(message):
+    return json.dumps({'error': message}).encode('utf-8')
+
+async def _write_response(writer, status, body, keep_alive):
+    head = (
+        f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+        f"Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    )
+    writer.write(head.encode('latin-1') + body)
+    await writer.drain()
+
+async def serve(service, host='127.0.0.1', port=8000):
+    server = await asyncio.start_server(service.handle, host, port)
+    print(f"Serving sales analyses on http://{host}:{port} (dataset version {service.db.version})")
+    async with server:
+        await server.serve_forever()
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the sales analyses as JSON over HTTP.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (or threads) for aggregations')
+    parser.add_argument('--threads', action='store_true', help='run aggregations in threads; they then share the GIL and run one at a time')
+    parser.add_argument('--reload-interval', type=float, default=0, help='seconds between incremental reloads, 0 to disable')
+    args = parser.parse_args()
+
+    db = Database()
+    db.load_data('data/branches.csv', 'data/sales.csv', 'data/products.csv')
+    if args.reload_interval > 0:
+        db.start_auto_reload(args.reload_interval)
+
+    executor = ThreadPoolExecutor(max_workers=args.workers) if args.threads else create_process_pool(db, args.workers)
+    service = QueryService(db, executor)
+    try:
+        asyncio.run(serve(service, args.host, args.port))
+    except KeyboardInterrupt:
+        print("Server stopped.")
+    finally:
+        executor.shutdown()
+        db.stop_auto_reload()
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,16 @@
 from datetime import datetime
 
 class Sale:
-    def __init__(self, sale_id, branch_id, product, quantity, total_price, date, item_price):
+    def __init__(self, sale_id, branch_id, product, quantity, total_price, date, item_price, basket_id=None):
         self.sale_id = sale_id
         self.branch_id = branch_id
         self.product = product
         self.quantity = quantity
         self.total_price = total_price
-        self.date = datetime.strptime(date, '%Y-%m-%d %H:%M:%S')
+        # Validated loads hand over an already parsed datetime
+        self.date = date if isinstance(date, datetime) else datetime.strptime(date, '%Y-%m-%d %H:%M:%S')
         self.item_price = item_price  
+        self.basket_id = basket_id
 
     def get_hour(self):
         return self.date.hour
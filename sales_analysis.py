@@ -1,6 +1,8 @@
 from abc import ABC, abstractmethod
 from collections import defaultdict
 import matplotlib.pyplot as plt
+from chart_cache import chart_cache, downsample_dates
+from table_renderer import TableRenderer
 
 class SalesAnalysisStrategy(ABC):
     @abstractmethod
@@ -66,75 +68,61 @@ class MonthlySalesAnalysis(SalesAnalysisStrategy):
         branch_data['hourly_sales_report'] = branch_data['hourly_sales']
 
 def print_table(headers, rows):
-    col_widths = [max(len(str(item)) for item in column) for column in zip(headers, *rows)]
-    row_format = "| " + " | ".join(f"{{:<{width}}}" for width in col_widths) + " |"
-    header_divider = "+-" + "-+-".join("-" * width for width in col_widths) + "-+"
-
-    print(header_divider)
-    print(row_format.format(*headers))
-    print(header_divider)
-    for row in rows:
-        print(row_format.format(*row))
-    print(header_divider)
+    # Fixed-size report tables; --limit/--offset/--page-size apply only to
+    # the long listings, which use table_renderer.render_table
+    TableRenderer(headers).render(rows)
 
 def plot_daily_sales_report(daily_sales_report):
-    plt.figure(figsize=(12, 6))
+    series = {}
     for branch_id, data in daily_sales_report.items():
         dates = sorted(data.keys())
-        quantities = [data[date]['quantity'] for date in dates]
-        plt.plot(dates, quantities, marker='o', label=f'Branch {branch_id}')
-    
-    plt.title('Daily Sales Report for All Branches')
-    plt.xlabel('Date')
-    plt.ylabel('Sales Quantity')
-    plt.legend()
-    plt.grid(True)
-    plt.xticks(rotation=45)
-    plt.tight_layout()
-    plt.show()
+        series[branch_id] = downsample_dates(dates, [data[date]['quantity'] for date in dates])
+
+    def draw():
+        for branch_id, (dates, quantities) in series.items():
+            plt.plot(dates, quantities, marker='o', label=f'Branch {branch_id}')
+        _finish_line_chart('Daily Sales Report for All Branches', 'Date')
+
+    chart_cache.render('daily_sales', series, {'figsize': (12, 6)}, draw)
 
 def plot_hourly_sales_report(hourly_sales_report):
-    plt.figure(figsize=(12, 6))
+    series = {}
     for branch_id, data in hourly_sales_report.items():
         hours = sorted(data.keys())
-        quantities = [data[hour] for hour in hours]
-        plt.plot(hours, quantities, marker='o', label=f'Branch {branch_id}')
-    
-    plt.title('Hourly Sales Report for All Branches')
-    plt.xlabel('Hour')
-    plt.ylabel('Sales Quantity')
-    plt.legend()
-    plt.grid(True)
-    plt.xticks(rotation=45)
-    plt.tight_layout()
-    plt.show()
+        series[branch_id] = (hours, [data[hour] for hour in hours])
+
+    def draw():
+        for branch_id, (hours, quantities) in series.items():
+            plt.plot(hours, quantities, marker='o', label=f'Branch {branch_id}')
+        _finish_line_chart('Hourly Sales Report for All Branches', 'Hour')
+
+    chart_cache.render('hourly_sales', series, {'figsize': (12, 6)}, draw)
 
 def plot_specific_branch_daily_sales_report(daily_sales_report, branch_id):
-    plt.figure(figsize=(12, 6))
     dates = sorted(daily_sales_report.keys())
-    quantities = [daily_sales_report[date]['quantity'] for date in dates]
-    plt.plot(dates, quantities, marker='o', label=f'Branch {branch_id}')
-    
-    plt.title(f'Daily Sales Report for Branch {branch_id}')
-    plt.xlabel('Date')
-    plt.ylabel('Sales Quantity')
-    plt.legend()
-    plt.grid(True)
-    plt.xticks(rotation=45) 
-    plt.tight_layout()
-    plt.show()
+    dates, quantities = downsample_dates(dates, [daily_sales_report[date]['quantity'] for date in dates])
+
+    def draw():
+        plt.plot(dates, quantities, marker='o', label=f'Branch {branch_id}')
+        _finish_line_chart(f'Daily Sales Report for Branch {branch_id}', 'Date')
+
+    chart_cache.render('branch_daily_sales', (branch_id, dates, quantities), {'figsize': (12, 6)}, draw)
 
 def plot_specific_branch_hourly_sales_report(hourly_sales_report, branch_id):
-    plt.figure(figsize=(12, 6))
     hours = sorted(hourly_sales_report.keys())
     quantities = [hourly_sales_report[hour] for hour in hours]
-    plt.plot(hours, quantities, marker='o', label=f'Branch {branch_id}')
-    
-    plt.title(f'Hourly Sales Report for Branch {branch_id}')
-    plt.xlabel('Hour')
+
+    def draw():
+        plt.plot(hours, quantities, marker='o', label=f'Branch {branch_id}')
+        _finish_line_chart(f'Hourly Sales Report for Branch {branch_id}', 'Hour')
+
+    chart_cache.render('branch_hourly_sales', (branch_id, hours, quantities), {'figsize': (12, 6)}, draw)
+
+def _finish_line_chart(title, xlabel):
+    plt.title(title)
+    plt.xlabel(xlabel)
     plt.ylabel('Sales Quantity')
     plt.legend()
     plt.grid(True)
-    plt.xticks(rotation=45) 
+    plt.xticks(rotation=45)
     plt.tight_layout()
-    plt.show()
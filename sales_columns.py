@@ -0,0 +1,118 @@
+import numpy as np
+
+def weekday_of(days):
+    # Monday is 0; 1970-01-01 (day 0) was a Thursday
+    return (np.asarray(days).astype('datetime64[D]').astype(np.int64) + 3) % 7
+
+# Column-oriented view of the loaded sales, shared by the vectorized analyses.
+# Identifiers are dictionary-encoded so they can be used directly as array indices.
+class SalesColumns:
+    def __init__(self, branch_ids, product_ids, categories, branch_codes, product_codes,
+                 category_codes, quantity, total_price, item_price, timestamps, sale_ids):
+        self.branch_ids = branch_ids
+        self.product_ids = product_ids
+        self.categories = categories
+        self.branch_codes = branch_codes
+        self.product_codes = product_codes
+        self.category_codes = category_codes
+        self.quantity = quantity
+        self.total_price = total_price
+        self.item_price = item_price
+        self.timestamps = timestamps
+        self.sale_ids = sale_ids
+
+    def __len__(self):
+        return len(self.quantity)
+
+    @classmethod
+    def from_branches(cls, branches):
+        return cls.from_sales(sale for branch in branches for sale in branch.sales)
+
+    @classmethod
+    def from_sales(cls, sales):
+        branch_index, product_index, category_index = {}, {}, {}
+        branch_codes, product_codes, category_codes = [], [], []
+        quantity, total_price, item_price, timestamps, sale_ids = [], [], [], [], []
+
+        for sale in sales:
+            if sale.product is None:
+                continue
+            branch_codes.append(branch_index.setdefault(sale.branch_id, len(branch_index)))
+            product_codes.append(product_index.setdefault(sale.product.product_id, len(product_index)))
+            category_codes.append(category_index.setdefault(sale.product.category, len(category_index)))
+            quantity.append(sale.quantity)
+            total_price.append(sale.total_price)
+            item_price.append(sale.item_price)
+            timestamps.append(sale.date)
+            sale_ids.append(sale.sale_id)
+
+        return cls(
+            branch_ids=list(branch_index),
+            product_ids=list(product_index),
+            categories=list(category_index),
+            branch_codes=np.array(branch_codes, dtype=np.int64),
+            product_codes=np.array(product_codes, dtype=np.int64),
+            category_codes=np.array(category_codes, dtype=np.int64),
+            quantity=np.array(quantity, dtype=np.int64),
+            total_price=np.array(total_price, dtype=np.float64),
+            item_price=np.array(item_price, dtype=np.float64),
+            timestamps=np.array(timestamps, dtype='datetime64[s]'),
+            sale_ids=sale_ids
+        )
+
+    def days(self):
+        return self.timestamps.astype('datetime64[D]')
+
+    def weekdays(self):
+        return weekday_of(self.days())
+
+    def branch_rows(self, branch_ids):
+        # Position of each sale's branch in branch_ids, or -1 if it is not listed
+        branch_index = {branch_id: i for i, branch_id in enumerate(branch_ids)}
+        code_to_row = np.array([branch_index.get(branch_id, -1) for branch_id in self.branch_ids], dtype=np.int64)
+        return code_to_row[self.branch_codes] if len(self) else np.empty(0, dtype=np.int64)
+
+    def concat(self, other):
+        # Rows of both views, with other's identifiers re-encoded against this one's
+        branch_ids, branch_codes = _merge_codes(self.branch_ids, other.branch_ids)
+        product_ids, product_codes = _merge_codes(self.product_ids, other.product_ids)
+        categories, category_codes = _merge_codes(self.categories, other.categories)
+        return SalesColumns(
+            branch_ids=branch_ids,
+            product_ids=product_ids,
+            categories=categories,
+            branch_codes=np.concatenate([self.branch_codes, branch_codes[other.branch_codes]]),
+            product_codes=np.concatenate([self.product_codes, product_codes[other.product_codes]]),
+            category_codes=np.concatenate([self.category_codes, category_codes[other.category_codes]]),
+            quantity=np.concatenate([self.quantity, other.quantity]),
+            total_price=np.concatenate([self.total_price, other.total_price]),
+            item_price=np.concatenate([self.item_price, other.item_price]),
+            timestamps=np.concatenate([self.timestamps, other.timestamps]),
+            sale_ids=self.sale_ids + other.sale_ids
+        )
+
+    def take(self, indices):
+        return SalesColumns(
+            branch_ids=self.branch_ids,
+            product_ids=self.product_ids,
+            categories=self.categories,
+            branch_codes=self.branch_codes[indices],
+            product_codes=self.product_codes[indices],
+            category_codes=self.category_codes[indices],
+            quantity=self.quantity[indices],
+            total_price=self.total_price[indices],
+            item_price=self.item_price[indices],
+            timestamps=self.timestamps[indices],
+            sale_ids=[self.sale_ids[i] for i in indices]
+        )
+
+def _merge_codes(values, other_values):
+    # Extends values with the new entries of other_values and maps each of
+    # other_values to its position in the result
+    index = {value: i for i, value in enumerate(values)}
+    merged = list(values)
+    for value in other_values:
+        if value not in index:
+            index[value] = len(merged)
+            merged.append(value)
+    return merged, np.array([index[value] for value in other_values], dtype=np.int64)
@@ -0,0 +1,167 @@
+import sys
+import threading
+from collections import Counter
+from datetime import datetime
+
+# Process-wide defaults, set from the command line by main.py
+settings = {'refresh': 2.0}
+
+def configure(refresh=2.0):
+    if refresh <= 0:
+        raise ValueError(f"Refresh interval must be positive, got {refresh}.")
+    settings.update(refresh=refresh)
+
+# Running totals for the current trading day. "Today" is the date of the
+# newest sale seen, so replayed history and live data behave the same. Only
+# newly ingested sales are folded in; nothing is recomputed from history.
+class DashboardAggregates:
+    def __init__(self, branch_ids=()):
+        self.branch_ids = list(branch_ids)
+        self.reset()
+
+    def reset(self):
+        self.day = None
+        self.branches = {}
+        self.hourly_revenue = [0.0] * 24
+        self.changed = True
+
+    # Observer hook for Database ingest notifications
+    def update(self, data):
+        if data.get('full_reload'):
+            self.reset()
+        self.process_sales(data['sales'])
+
+    def process_sales(self, sales):
+        for sale in sales:
+            self.process(sale)
+
+    def process(self, sale):
+        day = sale.date.date()
+        if self.day is None or day > self.day:
+            self.day = day
+            self.branches = {}
+            self.hourly_revenue = [0.0] * 24
+        elif day < self.day:
+            return
+
+        branch = self.branches.get(sale.branch_id)
+        if branch is None:
+            branch = self.branches[sale.branch_id] = {'revenue': 0.0, 'transactions': 0, 'products': Counter()}
+            if sale.branch_id not in self.branch_ids:
+                self.branch_ids.append(sale.branch_id)
+        branch['revenue'] += sale.total_price
+        branch['transactions'] += 1
+        branch['products'][sale.product.product_id] += sale.quantity
+        self.hourly_revenue[sale.date.hour] += sale.total_price
+        self.changed = True
+
+    def load(self, branches):
+        # Prime from an already loaded snapshot: find the newest day first so
+        # only that day's sales are folded in
+        self.reset()
+        self.branch_ids = [branch.branch_id for branch in branches]
+        latest = max((sale.date for branch in branches for sale in branch.sales), default=None)
+        if latest is None:
+            return
+        start = datetime(latest.year, latest.month, latest.day)
+        self.process_sales(sorted(
+            (sale for branch in branches for sale in branch.sales if sale.date >= start),
+            key=lambda sale: sale.date
+        ))
+
+# Lays the dashboard out as fixed-width cells and, after the first frame,
+# writes only the cells whose text changed, using ANSI cursor positioning.
+class DashboardView:
+    BRANCH_COLUMNS = [("Branch ID", 10), ("Revenue", 14), ("Transactions", 13), ("Top Products", 40)]
+    BAR_WIDTH = 40
+
+    def __init__(self, output=None, top=3):
+        self.output = output or sys.stdout
+        self.top = top
+        self._previous = None
+        self._bottom = 1
+
+    def cells(self, aggregates, status):
+        cells = {}
+        day = aggregates.day.isoformat() if aggregates.day else "no sales yet"
+        cells[(1, 1)] = f"=== Live Sales Dashboard: {day} ===".ljust(60)
+        cells[(2, 1)] = status.ljust(100)[:100]
+
+        column = 1
+        for header, width in self.BRANCH_COLUMNS:
+            cells[(4, column)] = header.ljust(width)[:width]
+            column += width + 3
+        row = 5
+        for branch_id in aggregates.branch_ids:
+            branch = aggregates.branches.get(branch_id, {'revenue': 0.0, 'transactions': 0, 'products': Counter()})
+            top = ", ".join(f"{product_id} ({quantity})" for product_id, quantity in branch['products'].most_common(self.top))
+            values = [branch_id, f"{branch['revenue']:.2f}", str(branch['transactions']), top]
+            column = 1
+            for value, (_, width) in zip(values, self.BRANCH_COLUMNS):
+                cells[(row, column)] = value.ljust(width)[:width]
+                column += width + 3
+            row += 1
+
+        row += 1
+        cells[(row, 1)] = "Hourly Revenue".ljust(60)
+        peak = max(aggregates.hourly_revenue) or 1.0
+        for hour, revenue in enumerate(aggregates.hourly_revenue):
+            bar = "#" * int(round(self.BAR_WIDTH * revenue / peak))
+            cells[(row + 1 + hour, 1)] = f"{hour:02d}:00 {bar.ljust(self.BAR_WIDTH)} {revenue:>12.2f}"
+        self._bottom = row + 25
+        return cells
+
+    def draw(self, aggregates, status=""):
+        cells = self.cells(aggregates, status)
+        if self._previous is None or set(cells) != set(self._previous):
+            # First frame, or the layout changed (e.g. a new branch): clear and draw everything
+            parts = ["\x1b[?25l\x1b[2J"]
+            changed = cells
+        else:
+            parts = []
+            changed = {position: text for position, text in cells.items() if self._previous[position] != text}
+        for (row, column), text in sorted(changed.items()):
+            parts.append(f"\x1b[{row};{column}H{text}")
+        if parts:
+            parts.append(f"\x1b[{self._bottom};1H")
+            self.output.write("".join(parts))
+            self.output.flush()
+        self._previous = cells
+        return len(changed)
+
+    def close(self):
+        self.output.write("\x1b[?25h\n")
+        self.output.flush()
+
+# Polls the sales file for appended rows at the refresh rate. Each poll reads
+# only the new bytes, the aggregates absorb only the new sales, and the screen
+# is only touched when something changed, so an idle dashboard costs next to
+# nothing regardless of how much history is loaded.
+def run_dashboard(db, refresh=None, output=None, stop=None, iterations=None):
+    refresh = refresh or settings['refresh']
+    stop = stop or threading.Event()
+    aggregates = DashboardAggregates()
+    aggregates.load(db.get_branches())
+    view = DashboardView(output)
+    db.add_ingest_observer(aggregates)
+    status = ""
+    try:
+        polls = 0
+        while True:
+            if aggregates.changed or status:
+                view.draw(aggregates, f"Updated {datetime.now():%H:%M:%S}, refresh every {refresh:g}s. Press Ctrl+C to return. {status}")
+                aggregates.changed = False
+                status = ""
+            polls += 1
+            if (iterations is not None and polls >= iterations) or stop.wait(refresh):
+                break
+            try:
+                db.load_incremental()
+            except (OSError, ValueError) as e:
+                status = f"Reload failed: {e}"
+    except KeyboardInterrupt:
+        pass
+    finally:
+        db.remove_ingest_observer(aggregates)
+        view.close()
+    return aggregates
@@ -1,13 +1,28 @@
 import matplotlib.pyplot as plt
 from database import Database
 
+def compute_sales_distribution(branches):
+    sales = [sale.total_price for branch in branches for sale in branch.sales]
+    if not sales:
+        return None
+
+    return {
+        'count': len(sales),
+        'average_purchase_value': sum(sales) / len(sales),
+        'below_1000': len([x for x in sales if x < 1000]),
+        'between_1000_and_5000': len([x for x in sales if 1000 <= x <= 5000]),
+        'above_5000': len([x for x in sales if x > 5000])
+    }
+
 def sales_distribution_analysis():
-    db = Database()
-    db.load_data('data/branches.csv', 'data/sales.csv', 'data/products.csv')
+    # Reads the resident snapshot; reloading here would reset every ingest
+    # observer and drop the approximate sample
+    snapshot = Database().snapshot()
 
-    sales = [sale.total_price for branch in db.get_branches() for sale in branch.sales]
+    sales = [sale.total_price for branch in snapshot.get_branches() for sale in branch.sales]
+    distribution = compute_sales_distribution(snapshot.get_branches())
 
-    if not sales:
+    if not distribution:
         print("No sales data available.")
         return
 
@@ -23,19 +38,15 @@ def sales_distribution_analysis():
     plt.show()
 
     # Average Purchase Value
-    average_value = sum(sales) / len(sales)
     print("\n--- Average Purchase Value ---")
-    print(f"Average Purchase Value: {average_value:.2f} LKR")
+    print(f"Average Purchase Value: {distribution['average_purchase_value']:.2f} LKR")
 
     # Value Segmentation
-    below_1000 = len([x for x in sales if x < 1000])
-    between_1000_and_5000 = len([x for x in sales if 1000 <= x <= 5000])
-    above_5000 = len([x for x in sales if x > 5000])
-
     print("\n--- Purchase Value Segmentation ---")
-    print(f"Purchases below 1000 LKR: {below_1000}")
-    print(f"Purchases between 1000 and 5000 LKR: {between_1000_and_5000}")
-    print(f"Purchases above 5000 LKR: {above_5000}")
+    print(f"Purchases below 1000 LKR: {distribution['below_1000']}")
+    print(f"Purchases between 1000 and 5000 LKR: {distribution['between_1000_and_5000']}")
+    print(f"Purchases above 5000 LKR: {distribution['above_5000']}")
 
 if __name__ == "__main__":
+    Database().load_data('data/branches.csv', 'data/sales.csv', 'data/products.csv')
     sales_distribution_analysis()
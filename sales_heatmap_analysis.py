@@ -0,0 +1,83 @@
+from abc import ABC, abstractmethod
+from datetime import datetime
+import numpy as np
+import matplotlib.pyplot as plt
+from sales_columns import SalesColumns
+
+WEEKDAYS = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+HOURS = 24
+
+class SalesHeatmapAnalysisStrategy(ABC):
+    @abstractmethod
+    def analyze(self, start=None, end=None):
+        pass
+
+# Branch x weekday x hour tensors of quantity, revenue and transaction count,
+# accumulated with a single bincount per metric over the timestamp column.
+class BranchHourWeekdayAnalysis(SalesHeatmapAnalysisStrategy):
+    def __init__(self, branches, columns=None):
+        self.branch_ids = [branch.branch_id for branch in branches]
+        self.columns = columns if columns is not None else SalesColumns.from_branches(branches)
+
+    def analyze(self, start=None, end=None):
+        columns = self.columns
+        n_branches = len(self.branch_ids)
+        shape = (n_branches, len(WEEKDAYS), HOURS)
+        size = n_branches * len(WEEKDAYS) * HOURS
+
+        rows = columns.branch_rows(self.branch_ids)
+
+        days = columns.days()
+        mask = rows >= 0
+        if start is not None:
+            mask &= days >= _as_day(start)
+        if end is not None:
+            mask &= days <= _as_day(end)
+
+        days = days[mask]
+        hours = (columns.timestamps[mask] - days).astype('timedelta64[h]').astype(np.int64)
+        weekdays = columns.weekdays()[mask]
+        flat_index = (rows[mask] * len(WEEKDAYS) + weekdays) * HOURS + hours
+
+        return {
+            'branches': list(self.branch_ids),
+            'quantity': np.bincount(flat_index, weights=columns.quantity[mask], minlength=size).reshape(shape),
+            'revenue': np.bincount(flat_index, weights=columns.total_price[mask], minlength=size).reshape(shape),
+            'transactions': np.bincount(flat_index, minlength=size).reshape(shape)
+        }
+
+def _as_day(value):
+    if isinstance(value, str):
+        value = datetime.strptime(value, '%Y-%m-%d')
+    return np.datetime64(value, 'D')
+
+def plot_sales_heatmap(heatmap, metric='quantity', branch_id=None):
+    if metric not in ('quantity', 'revenue', 'transactions'):
+        raise ValueError(f"Unknown metric {metric}. Expected quantity, revenue or transactions.")
+    if branch_id is not None and branch_id not in heatmap['branches']:
+        raise ValueError(f"Branch {branch_id} not found.")
+    values = heatmap[metric]
+    plt.figure(figsize=(14, 6))
+
+    if branch_id is not None:
+        grid = values[heatmap['branches'].index(branch_id)]
+        plt.imshow(grid, aspect='auto', cmap='viridis')
+        plt.yticks(range(len(WEEKDAYS)), WEEKDAYS)
+        plt.title(f'Sales {metric.capitalize()} by Weekday and Hour for Branch {branch_id}')
+        plt.ylabel('Weekday')
+        plt.xticks(range(HOURS))
+        plt.xlabel('Hour')
+    else:
+        # One row per branch, one column per (weekday, hour) slot
+        grid = values.reshape(len(heatmap['branches']), -1)
+        plt.imshow(grid, aspect='auto', cmap='viridis', interpolation='nearest')
+        if len(heatmap['branches']) <= 50:
+            plt.yticks(range(len(heatmap['branches'])), heatmap['branches'])
+        plt.xticks(range(0, grid.shape[1], HOURS), WEEKDAYS)
+        plt.title(f'Sales {metric.capitalize()} by Branch, Weekday and Hour')
+        plt.ylabel('Branch')
+        plt.xlabel('Weekday / Hour')
+
+    plt.colorbar(label=metric.capitalize())
+    plt.tight_layout()
+    plt.show()
@@ -0,0 +1,194 @@
+import csv
+import os
+import numpy as np
+
+REQUIRED_FIELDS = ('sale_id', 'branch_id', 'product_id', 'quantity', 'total_price', 'date', 'item_price')
+DATE_LENGTH = len('2024-06-01 08:00:00')
+
+def quarantine_path(sales_file):
+    return os.path.splitext(sales_file)[0] + '_quarantine.csv'
+
+# Checks a batch of raw sales rows one column at a time. Every check produces
+# a boolean mask over the whole batch, so the cost is a handful of numpy passes
+# rather than a try/except per field per row. Rows failing any check are
+# returned with their reasons; the parsed columns of the clean rows are
+# returned ready for building Sale objects. A total_price that disagrees with
+# quantity x item_price is only flagged unless strict_totals is set, since
+# discounts and rounding make such rows common in real exports.
+class SalesValidator:
+    def __init__(self, products, branch_ids, known_id_hashes=None, known_ids=None,
+                 strict_totals=False, rtol=1e-6, atol=0.01):
+        self.products = products
+        self.branch_ids = branch_ids
+        # Sorted hashes of the sale ids already loaded, plus a callable giving
+        # the ids themselves to rule out hash collisions
+        self.known_id_hashes = known_id_hashes if known_id_hashes is not None else np.empty(0, dtype=np.int64)
+        self.known_ids = known_ids
+        self.strict_totals = strict_totals
+        self.rtol = rtol
+        self.atol = atol
+
+    def validate(self, fieldnames, rows):
+        missing = [field for field in REQUIRED_FIELDS if field not in fieldnames]
+        if missing:
+            raise ValueError(f"Sales file is missing columns: {', '.join(missing)}")
+
+        n = len(rows)
+        width = len(fieldnames)
+        original = rows
+        shaped = np.fromiter(map(len, rows), dtype=np.int64, count=n) == width
+        if not shaped.all():
+            blank = [''] * width
+            rows = [row if ok else blank for row, ok in zip(rows, shaped.tolist())]
+        raw = {field: [row[i] for row in rows] for i, field in enumerate(fieldnames)}
+
+        quantity, quantity_ok = _parse_floats(raw['quantity'])
+        item_price, item_price_ok = _parse_floats(raw['item_price'])
+        total_price, total_price_ok = _parse_floats(raw['total_price'])
+        quantity_ok &= (quantity > 0) & (quantity == np.floor(quantity))
+        item_price_ok &= item_price >= 0
+        total_price_ok &= total_price >= 0
+        dates, dates_ok = _parse_dates(raw['date'])
+
+        sale_ids = raw['sale_id']
+        id_hashes = np.fromiter(map(hash, sale_ids), dtype=np.int64, count=n)
+        numbers_ok = quantity_ok & item_price_ok & total_price_ok
+
+        checks = [
+            (shaped & ~np.fromiter(map(bool, sale_ids), dtype=bool, count=n), "missing sale_id"),
+            (shaped & ~quantity_ok, "invalid quantity"),
+            (shaped & ~item_price_ok, "invalid item_price"),
+            (shaped & ~total_price_ok, "invalid total_price"),
+            (shaped & ~dates_ok, "invalid date"),
+            (shaped & ~_contained(raw['branch_id'], self.branch_ids), "unknown branch_id"),
+            (shaped & ~_contained(raw['product_id'], self.products), "unknown product_id"),
+        ]
+        mismatch = (shaped & numbers_ok & ~np.isclose(quantity * item_price, total_price, rtol=self.rtol, atol=self.atol),
+                    "total_price does not match quantity x item_price")
+        if self.strict_totals:
+            checks.append(mismatch)
+        bad = ~shaped
+        for mask, _ in checks:
+            bad |= mask
+        # Only rows that are otherwise clean take part in the duplicate check,
+        # so the first clean copy of an id is the one that loads
+        duplicate = ~bad & (self._repeated(sale_ids, id_hashes, ~bad) | self._already_loaded(sale_ids, id_hashes, ~bad))
+        checks.append((duplicate, "duplicate sale_id"))
+        bad |= duplicate
+
+        clean = np.flatnonzero(~bad)
+        rejected = np.flatnonzero(bad)
+        reasons = [
+            "; ".join(reason for mask, reason in checks if mask[i]) if shaped[i]
+            else f"expected {width} fields, got {len(original[i])}"
+            for i in rejected.tolist()
+        ]
+        flagged = [] if self.strict_totals else np.flatnonzero(mismatch[0] & ~bad).tolist()
+        if len(rejected):
+            keep = clean.tolist()
+            raw = {field: [values[i] for i in keep] for field, values in raw.items()}
+            quantity, total_price, item_price, dates = quantity[clean], total_price[clean], item_price[clean], dates[clean]
+        return {
+            'rows': n,
+            'fieldnames': list(fieldnames),
+            'clean': {
+                'sale_id': raw['sale_id'],
+                'branch_id': raw['branch_id'],
+                'product_id': raw['product_id'],
+                'quantity': quantity.astype(np.int64).tolist(),
+                'total_price': total_price.tolist(),
+                'item_price': item_price.tolist(),
+                'date': dates.astype(object).tolist(),
+                'basket_id': [basket_id or None for basket_id in raw['basket_id']] if 'basket_id' in raw else None
+            },
+            'clean_id_hashes': id_hashes[clean],
+            'quarantined': [(original[i], reason) for i, reason in zip(rejected.tolist(), reasons)],
+            'flagged': [(original[i], mismatch[1]) for i in flagged]
+        }
+
+    def _repeated(self, sale_ids, id_hashes, candidates):
+        # Equal hashes are found by sorting; only those few rows are compared
+        # as strings, to tell real duplicates from hash collisions
+        repeated = np.zeros(len(sale_ids), dtype=bool)
+        index = np.flatnonzero(candidates)
+        order = index[np.argsort(id_hashes[index], kind='stable')]
+        same = id_hashes[order[1:]] == id_hashes[order[:-1]]
+        if not same.any():
+            return repeated
+        shared = np.zeros(len(order), dtype=bool)
+        shared[1:] |= same
+        shared[:-1] |= same
+        seen = set()
+        for i in np.sort(order[shared]).tolist():
+            if sale_ids[i] in seen:
+                repeated[i] = True
+            else:
+                seen.add(sale_ids[i])
+        return repeated
+
+    def _already_loaded(self, sale_ids, id_hashes, candidates):
+        loaded = np.zeros(len(sale_ids), dtype=bool)
+        if not len(self.known_id_hashes):
+            return loaded
+        positions = np.searchsorted(self.known_id_hashes, id_hashes).clip(max=len(self.known_id_hashes) - 1)
+        matches = np.flatnonzero(candidates & (self.known_id_hashes[positions] == id_hashes))
+        if len(matches):
+            known_ids = self.known_ids()
+            for i in matches.tolist():
+                loaded[i] = sale_ids[i] in known_ids
+        return loaded
+
+def _parse_floats(values):
+    try:
+        parsed = np.array(values, dtype=np.float64)
+    except ValueError:
+        # Some value is not a number: fall back to parsing one by one
+        parsed = np.fromiter(map(_to_float, values), dtype=np.float64, count=len(values))
+    return parsed, np.isfinite(parsed)
+
+def _to_float(value):
+    try:
+        return float(value)
+    except ValueError:
+        return np.nan
+
+def _parse_dates(values):
+    # Only the full 'YYYY-MM-DD HH:MM:SS' form is accepted, as before
+    well_formed = np.fromiter(map(len, values), dtype=np.int64, count=len(values)) == DATE_LENGTH
+    try:
+        parsed = np.array(values, dtype='datetime64[s]')
+    except ValueError:
+        parsed = np.fromiter(map(_to_datetime, values), dtype='datetime64[s]', count=len(values))
+    return parsed, well_formed & ~np.isnat(parsed)
+
+def _to_datetime(value):
+    try:
+        return np.datetime64(value, 's')
+    except ValueError:
+        return np.datetime64('NaT', 's')
+
+def _contained(values, collection):
+    return np.fromiter(map(collection.__contains__, values), dtype=bool, count=len(values))
+
+def write_quarantine(path, fieldnames, entries):
+    # One line per rejected or flagged row: its original fields, whether it
+    # was loaded, and the reasons
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(list(fieldnames) + ['action', 'reason'])
+        width = len(fieldnames)
+        for row, action, reason in entries:
+            # Rows with the wrong number of fields are cut or padded to fit
+            writer.writerow(list(row[:width]) + [''] * (width - len(row)) + [action, reason])
+
+def save_quarantine(sales_file, validation):
+    # Writes the rows of a snapshot's validation summary next to the sales
+    # file, or removes a stale list after a clean load. Returns the path, or
+    # None if there was nothing to list.
+    path = quarantine_path(sales_file)
+    if validation['quarantined'] or validation['flagged']:
+        write_quarantine(path, validation['fieldnames'], validation['entries'])
+        return path
+    if os.path.exists(path):
+        os.remove(path)
+    return None
@@ -0,0 +1,83 @@
+import sys
+from itertools import chain, islice
+
+# Process-wide defaults, set from the command line by main.py
+settings = {'limit': None, 'offset': 0, 'page_size': None}
+
+def configure(limit=None, offset=0, page_size=None):
+    settings.update(limit=limit, offset=offset, page_size=page_size)
+
+# Renders a table from any row iterator. Column widths come from a fixed
+# schema or from the first sample_size rows, so output starts before the rest
+# of the rows have even been produced. A later value wider than its column
+# widens the column from that row on, marked by a new divider line. Lines are
+# written in chunks to the output stream rather than one print() per row.
+class TableRenderer:
+    def __init__(self, headers, widths=None, sample_size=1000, output=None,
+                 limit=None, offset=0, page_size=None, first_screen=50, chunk_size=1000):
+        self.headers = [str(header) for header in headers]
+        self.widths = widths
+        self.sample_size = sample_size
+        self.output = output
+        self.limit = limit
+        self.offset = offset
+        self.page_size = page_size
+        self.first_screen = first_screen
+        self.chunk_size = chunk_size
+
+    def render(self, rows):
+        output = self.output or sys.stdout
+        rows = iter(rows)
+        if self.offset:
+            rows = islice(rows, self.offset, None)
+        if self.limit is not None:
+            rows = islice(rows, self.limit)
+
+        sample = [[str(cell) for cell in row] for row in islice(rows, self.sample_size)]
+        widths = list(self.widths or [
+            max([len(header)] + [len(row[i]) for row in sample])
+            for i, header in enumerate(self.headers)
+        ])
+        row_format, divider = _layout(widths)
+
+        buffer = [divider, row_format.format(*self.headers), divider]
+        count = 0
+        for row in chain(sample, rows):
+            cells = [str(cell) for cell in row]
+            if any(len(cell) > width for cell, width in zip(cells, widths)):
+                widths = [max(width, len(cell)) for cell, width in zip(cells, widths)]
+                row_format, divider = _layout(widths)
+                buffer.append(divider)
+            buffer.append(row_format.format(*cells))
+            count += 1
+            if count == self.first_screen or len(buffer) >= self.chunk_size:
+                _flush(output, buffer)
+            if self.page_size and count % self.page_size == 0:
+                _flush(output, buffer)
+                if not next_page():
+                    break
+        buffer.append(divider)
+        _flush(output, buffer)
+        return count
+
+def _layout(widths):
+    row_format = "| " + " | ".join(f"{{:<{width}}}" for width in widths) + " |"
+    divider = "+-" + "-+-".join("-" * width for width in widths) + "-+"
+    return row_format, divider
+
+def _flush(output, buffer):
+    if buffer:
+        output.write("\n".join(buffer) + "\n")
+        buffer.clear()
+    output.flush()
+
+def next_page():
+    answer = input("-- More -- (Enter for next page, q to stop): ")
+    return answer.strip().lower() != 'q'
+
+def render_table(headers, rows, **options):
+    # For long listings: applies the command-line limit, offset and page size
+    # unless overridden. Fixed-size tables use TableRenderer directly.
+    for name, value in settings.items():
+        options.setdefault(name, value)
+    return TableRenderer(headers, **options).render(rows)
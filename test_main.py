@@ -5,6 +5,46 @@ from main import (
     PlotDailySalesReportObserver, PlotHourlySalesReportObserver,
     User, Authentication, main_menu, perform_monthly_sales_analysis
 )
+from database import Database
+from daily_series import DailySalesSeries
+from sales_validation import save_quarantine
+from sales_columns import SalesColumns
+from sales_heatmap_analysis import BranchHourWeekdayAnalysis
+from product_preference_analysis import CoPurchaseAnalysis
+from approximate_analysis import StratifiedSample, ApproximateMonthlySalesAnalysis
+from sales_analysis import MonthlySalesAnalysis, print_table
+from sales_distribution_analysis import sales_distribution_analysis
+from query_server import QueryService, ENDPOINTS, create_process_pool
+from data_export import write_rows, sales_rows, SALES_SCHEMA
+from chart_cache import ChartCache, lttb, chart_cache
+from table_renderer import TableRenderer, settings as table_settings
+from weekly_sales_analysis import WeeklySalesAnalysis, WeeklySalesPlotter
+from branch_comparison_analysis import BranchComparisonAnalysis, print_branch_similarity_table
+from anomaly_detection import SalesAnomalyDetector
+from sales_dashboard import DashboardAggregates, DashboardView
+from demand_forecast_analysis import DemandForecastAnalysis, fit_seasonal_smoothing, fit_linear_trend
+import numpy as np
+import asyncio
+import os
+import json
+import io
+import csv
+import threading
+from branch import Branch
+from product import Product
+from sale import Sale
+
+@pytest.fixture(autouse=True)
+def chart_cache_in_tmp(tmp_path, monkeypatch):
+    # Keep rendered charts out of the working tree
+    monkeypatch.setattr(chart_cache, 'directory', str(tmp_path / 'chart_cache'))
+
+@pytest.fixture
+def branches():
+    # Call through the class: other tests replace load_data on the shared instance
+    db = Database()
+    Database.load_data(db, 'data/branches.csv', 'data/sales.csv', 'data/products.csv')
+    return db.get_branches()
 
 # Test Database Singleton
 def test_database_singleton():
@@ -51,7 +91,7 @@ def test_perform_monthly_sales_analysis(monkeypatch):
     notifier.add_observer(PlotHourlySalesReportObserver())
 
     monkeypatch.setattr('builtins.input', lambda _: '1')
-    monkeypatch.setattr('main.display_analysis_options', lambda: '3')
+    monkeypatch.setattr('main.display_analysis_options', lambda: '6')
 
     with patch('main.MonthlySalesAnalysis.analyze', return_value={
         'branch1': {
@@ -73,8 +113,412 @@ def test_main_menu(monkeypatch):
     user = User('admin', 'admin')
 
     monkeypatch.setattr('builtins.input', lambda _: '7')
+    monkeypatch.setattr('main.save_quarantine', lambda sales_file, validation: None)
     exit_program = main_menu(auth, user)
     assert exit_program is True
 
+# Test Daily Sales Series
+def test_daily_series_range_total(branches):
+    series = DailySalesSeries(branches)
+    branch = next(branch for branch in branches if branch.branch_id == 'B003')
+    expected = sum(sale.total_price for sale in branch.sales if 3 <= sale.date.day <= 10 and sale.date.month == 6)
+    assert series.total('branch', 'B003', '2024-06-03', '2024-06-10') == pytest.approx(expected)
+
+def test_daily_series_append(branches):
+    sales = sorted((sale for branch in branches for sale in branch.sales), key=lambda sale: sale.date)
+    full = DailySalesSeries(branches)
+    incremental = DailySalesSeries()
+    incremental.append_sales(sales[:len(sales) // 2])
+    incremental.append_sales(sales[len(sales) // 2:])
+    for product_id in full.keys['product']:
+        assert incremental.total('product', product_id, '2024-01-01', '2024-12-31', 'quantity') == \
+            full.total('product', product_id, '2024-01-01', '2024-12-31', 'quantity')
+
+def test_daily_series_observer_grows_in_place(branches):
+    sales = sorted((sale for branch in branches for sale in branch.sales), key=lambda sale: sale.date)
+    series = DailySalesSeries()
+    series.update({'sales': [], 'full_reload': True, 'branches': list(branches) + [Branch('B999', 'New', 'Nowhere')]})
+    assert series.total('branch', 'B999', '2024-06-01', '2024-06-30') == 0
+    # Latest half first, then one day at a time from the start, older than anything stored
+    half = len(sales) // 2
+    series.update({'sales': sales[half:], 'full_reload': False, 'branches': None})
+    for day in range(1, 31):
+        series.append_sales([sale for sale in sales[:half] if sale.date.day == day])
+    full = DailySalesSeries(branches)
+    for branch in branches:
+        assert series.total('branch', branch.branch_id, '2024-06-02', '2024-06-27') == \
+            pytest.approx(full.total('branch', branch.branch_id, '2024-06-02', '2024-06-27'))
+    assert series.rolling_mean('branch', window=7)[:, -1][:len(branches)] == \
+        pytest.approx(full.rolling_mean('branch', window=7)[:, -1])
+
+# Test Sales Heatmap Analysis
+def test_branch_hour_weekday_heatmap(branches):
+    heatmap = BranchHourWeekdayAnalysis(branches).analyze()
+    branch = branches[0]
+    sale = branch.sales[0]
+    expected = sum(s.quantity for s in branch.sales
+                   if s.date.weekday() == sale.date.weekday() and s.date.hour == sale.date.hour)
+    assert heatmap['quantity'][0, sale.date.weekday(), sale.date.hour] == expected
+    assert heatmap['transactions'].sum() == sum(len(branch.sales) for branch in branches)
+
+def test_sales_columns_weekdays_and_branch_rows(branches):
+    columns = SalesColumns.from_branches(branches)
+    assert columns.weekdays().tolist() == [d.weekday() for d in columns.timestamps.astype(object)]
+    rows = columns.branch_rows(['B002', 'B001'])
+    assert set(rows[columns.branch_codes == columns.branch_ids.index('B003')]) == {-1}
+    assert set(rows[columns.branch_codes == columns.branch_ids.index('B001')]) == {1}
+
+# Test Co-Purchase Analysis
+def test_co_purchase_analysis():
+    products = [Product(f'P{i}', f'Product {i}', 10.0, 'Dairy') for i in range(4)]
+    baskets = [(0, 1), (0, 1), (0, 1, 2), (2, 3), (3,)]
+    branch = Branch('B001', 'Branch 1', 'Location 1')
+    for basket_id, items in enumerate(baskets):
+        for item in items:
+            branch.add_sale(Sale(f'S{basket_id}{item}', 'B001', products[item], 1, 10.0,
+                                 '2024-06-01 08:00:00', 10.0, basket_id=f'K{basket_id}'))
+
+    result = CoPurchaseAnalysis([branch], min_support=0.4, min_confidence=0.5).analyze()
+    assert result['basket_count'] == 5
+    supports = {frozenset(itemset['products']): itemset['support'] for itemset in result['itemsets']}
+    assert supports[frozenset(['P0', 'P1'])] == pytest.approx(0.6)
+    rule = next(rule for rule in result['rules'] if rule['antecedent'] == ('P0',) and rule['consequent'] == 'P1')
+    assert rule['confidence'] == pytest.approx(1.0)
+    assert rule['lift'] == pytest.approx(1.0 / 0.6)
+
+# Test Approximate Analysis
+def test_full_sample_is_exact(branches):
+    sample = StratifiedSample.from_branches(branches, fraction=1.0, seed=0)
+    approximate = ApproximateMonthlySalesAnalysis(sample).analyze(month=6, year=2024)
+    exact = MonthlySalesAnalysis(branches).analyze(month=6, year=2024)
+    for branch_id, data in exact.items():
+        figure = approximate[branch_id]['total_sales_amount']
+        assert figure['estimate'] == pytest.approx(data['total_sales_amount'])
+        assert figure['ci_high'] - figure['ci_low'] == pytest.approx(0.0)
+
+def test_sample_interval_covers_total(branches):
+    sample = StratifiedSample.from_branches(branches, fraction=0.5, seed=0)
+    assert len(sample) < sum(len(branch.sales) for branch in branches)
+    totals, margins = sample.estimate(sample.columns.total_price)
+    expected = sum(sale.total_price for branch in branches for sale in branch.sales)
+    assert totals[0] - margins[0] <= expected <= totals[0] + margins[0]
+
+def test_sample_extends_with_new_sales_only(branches):
+    sales = sorted((sale for branch in branches for sale in branch.sales), key=lambda sale: sale.date)
+    split = len(sales) - 100
+    sample = StratifiedSample(SalesColumns.from_sales(sales[:split]), target_error=0.05, seed=0)
+    extended = sample.extend(SalesColumns.from_sales(sales[split:]))
+    assert extended.fraction == sample.fraction and extended.population == len(sales)
+    assert extended.columns.sale_ids[:len(sample)] == sample.columns.sale_ids
+    assert len(sample.strata) == len(sample)
+    full = StratifiedSample(SalesColumns.from_sales(sales[:split]), fraction=1.0).extend(SalesColumns.from_sales(sales[split:]))
+    totals, margins = full.estimate(full.columns.total_price)
+    assert totals[0] == pytest.approx(sum(sale.total_price for sale in sales)) and margins[0] == pytest.approx(0.0)
+
+def test_sales_distribution_reads_resident_snapshot(branches, monkeypatch, capsys):
+    db = Database()
+    snapshot = db.snapshot()
+    monkeypatch.setattr(db, 'load_data', MagicMock(side_effect=AssertionError("reloaded")))
+    monkeypatch.setattr('sales_distribution_analysis.plt.show', lambda: None)
+    sales_distribution_analysis()
+    assert db.snapshot() is snapshot
+    assert "=== Sales Distribution Analysis ===" in capsys.readouterr().out
+
+# Test Database Snapshots
+def test_snapshot_columns_built_once_per_dataset(branches):
+    snapshot = Database().snapshot()
+    columns = snapshot.columns()
+    assert snapshot.columns() is columns and snapshot.replace(version=99).columns() is columns
+    assert snapshot.replace(branches=snapshot.branches[:1]).columns() is not columns
+    assert len(columns) == sum(len(branch.sales) for branch in snapshot.branches)
+
+def test_incremental_reload_keeps_old_snapshot(tmp_path):
+    for name in ('branches.csv', 'sales.csv', 'products.csv'):
+        (tmp_path / name).write_text(open(f'data/{name}').read())
+    db = Database()
+    Database.load_data(db, str(tmp_path / 'branches.csv'), str(tmp_path / 'sales.csv'), str(tmp_path / 'products.csv'))
+    old = db.snapshot()
+    with open(tmp_path / 'sales.csv', 'a') as f:
+        f.write('S9001,B002,P001,1,100.0,2024-07-01 08:00:00,100.0\nS9002,B003,P0')
+
+    new = db.load_incremental()
+    assert new.version == old.version + 1
+    assert sum(len(branch.sales) for branch in new.branches) == sum(len(branch.sales) for branch in old.branches) + 1
+    assert old.branches[1].sales[-1].sale_id != 'S9001'
+    assert new.branches[1].sales[-1].sale_id == 'S9001'
+
+def test_full_load_leaves_unterminated_row(tmp_path):
+    for name in ('branches.csv', 'products.csv'):
+        (tmp_path / name).write_text(open(f'data/{name}').read())
+    header = 'sale_id,branch_id,product_id,quantity,total_price,date,item_price\n'
+    (tmp_path / 'sales.csv').write_text(header + 'S1,B001,P001,1,100.0,2024-06-01 08:00:00,100.0\nS2,B001,P001,1,100.0,2024-06-01 09:00')
+    db = Database()
+    snapshot = Database.load_data(db, str(tmp_path / 'branches.csv'), str(tmp_path / 'sales.csv'), str(tmp_path / 'products.csv'))
+    assert [sale.sale_id for branch in snapshot.branches for sale in branch.sales] == ['S1']
+    with open(tmp_path / 'sales.csv', 'a') as f:
+        f.write(':00,100.0\n')
+    snapshot = db.load_incremental()
+    assert [sale.sale_id for branch in snapshot.branches for sale in branch.sales] == ['S1', 'S2']
+    assert snapshot.validation['quarantined'] == 0
+
+# Test Query Service
+def test_query_service_coalesces_and_caches(branches, monkeypatch):
+    calls = []
+    release = threading.Event()
+
+    def slow_query(snapshot, params):
+        calls.append(params)
+        release.wait(5)
+        return {'version': snapshot.version}
+
+    monkeypatch.setitem(ENDPOINTS, '/slow', slow_query)
+    service = QueryService(Database())
+
+    async def run():
+        pending = [asyncio.ensure_future(service.query('/slow', {})) for _ in range(5)]
+        await asyncio.sleep(0.05)
+        release.set()
+        results = await asyncio.gather(*pending)
+        results.append(await service.query('/slow', {}))
+        return results
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert len(set(results)) == 1
+
+def test_query_service_process_pool(tmp_path):
+    for name in ('branches.csv', 'sales.csv', 'products.csv'):
+        (tmp_path / name).write_text(open(f'data/{name}').read())
+    db = Database()
+    Database.load_data(db, str(tmp_path / 'branches.csv'), str(tmp_path / 'sales.csv'), str(tmp_path / 'products.csv'))
+    executor = create_process_pool(db, workers=1)
+    try:
+        service = QueryService(db, executor)
+        # Rows appended before the worker starts are not served until the server loads them
+        with open(tmp_path / 'sales.csv', 'a') as f:
+            f.write('S9001,B002,P001,1,100.0,2024-07-01 08:00:00,100.0\n')
+        before = json.loads(asyncio.run(service.query('/distribution', {})))
+        assert before == json.loads(json.dumps(ENDPOINTS['/distribution'](db.snapshot(), {})))
+        versions = [json.loads(asyncio.run(service.query('/version', {'n': str(i)})))['version'] for i in range(3)]
+        assert versions == [db.version] * 3
+        db.load_incremental()
+        after = json.loads(asyncio.run(service.query('/distribution', {})))
+        assert after['count'] == before['count'] + 1
+    finally:
+        executor.shutdown()
+
+# Test Data Export
+def test_export_sales_csv_in_batches(branches, tmp_path):
+    path = str(tmp_path / 'sales.csv')
+    count = write_rows(sales_rows(branches), path, SALES_SCHEMA, batch_size=100)
+    with open(path, newline='') as f:
+        rows = list(csv.DictReader(f))
+    assert count == len(rows) == sum(len(branch.sales) for branch in branches)
+    assert rows[0]['sale_id'] == branches[0].sales[0].sale_id
+    assert (tmp_path / 'sales.csv.schema.json').exists()
+
+# Test Chart Cache
+def test_lttb_keeps_endpoints_and_peaks():
+    y = [0.0] * 1000
+    y[500] = 100.0
+    keep = lttb(range(1000), y, 50)
+    assert len(keep) == 50
+    assert keep[0] == 0 and keep[-1] == 999
+    assert 500 in keep
+
+def test_chart_cache_renders_once(tmp_path):
+    cache = ChartCache(directory=str(tmp_path))
+    draw = MagicMock()
+    first = cache.render('chart', [1, 2, 3], {'figsize': (4, 3)}, draw, show=False)
+    second = cache.render('chart', [1, 2, 3], {'figsize': (4, 3)}, draw, show=False)
+    changed = cache.render('chart', [1, 2, 4], {'figsize': (4, 3)}, draw, show=False)
+    assert first == second != changed
+    assert draw.call_count == 2
+
+def test_chart_cache_evicts_least_recently_used(tmp_path):
+    cache = ChartCache(directory=str(tmp_path), max_files=2)
+    paths = [cache.render('chart', [i], {}, MagicMock(), show=False) for i in range(3)]
+    assert [os.path.exists(path) for path in paths] == [False, True, True]
+    os.utime(paths[1], (1, 1))
+    cache.render('chart', [2], {}, MagicMock(), show=False)
+    newest = cache.render('chart', [3], {}, MagicMock(), show=False)
+    assert not os.path.exists(paths[1]) and os.path.exists(paths[2]) and os.path.exists(newest)
+
+# Test Table Renderer
+def test_table_renderer_limit_and_offset():
+    output = io.StringIO()
+    count = TableRenderer(["ID", "Value"], output=output, limit=2, offset=1).render(iter([(1, 'a'), (2, 'bb'), (3, 'c'), (4, 'd')]))
+    assert count == 2
+    assert output.getvalue().splitlines() == [
+        "+----+-------+",
+        "| ID | Value |",
+        "+----+-------+",
+        "| 2  | bb    |",
+        "| 3  | c     |",
+        "+----+-------+"
+    ]
+
+def test_table_renderer_pagination_stops(monkeypatch):
+    output = io.StringIO()
+    monkeypatch.setattr('builtins.input', lambda _: 'q')
+    count = TableRenderer(["ID"], output=output, page_size=3).render((i,) for i in range(1000000))
+    assert count == 3
+
+def test_fixed_tables_ignore_listing_settings(monkeypatch, capsys):
+    monkeypatch.setitem(table_settings, 'offset', 20)
+    monkeypatch.setitem(table_settings, 'limit', 1)
+    print_table(["Metric", "Total"], [("Revenue", 1), ("Quantity", 2), ("Transactions", 3)])
+    assert "| Transactions |" in capsys.readouterr().out
+
+def test_weekly_report_pages_by_week(branches, monkeypatch):
+    weekly_sales = WeeklySalesAnalysis(branches).analyze(2024)
+    monkeypatch.setitem(table_settings, 'page_size', 2)
+    monkeypatch.setattr('builtins.input', lambda _: 'q')
+    output = io.StringIO()
+    WeeklySalesPlotter().print_tables(weekly_sales, output=output)
+    assert len(weekly_sales) > 2
+    assert output.getvalue().count("Weekly Sales Report:") == 2
+
+# Test Branch Comparison
+def test_branch_comparison_matrix(branches):
+    comparison = BranchComparisonAnalysis(branches, dimension='category').analyze(month=6, year=2024)
+    dense = comparison['matrix'].toarray()
+    assert dense.sum() == pytest.approx(sum(sale.total_price for branch in branches for sale in branch.sales))
+    assert comparison['share_of_wallet'].toarray().sum(axis=0) == pytest.approx(np.ones(dense.shape[1]))
+    assert comparison['correlation'] == pytest.approx(np.corrcoef(dense))
+    assert np.diag(comparison['cosine_similarity']) == pytest.approx(np.ones(len(branches)))
+
+def test_branch_similarity_table_lists_nearest_branches(branches, capsys):
+    comparison = BranchComparisonAnalysis(branches).analyze(month=6, year=2024)
+    branch_id = comparison['branches'][0]
+    print_branch_similarity_table(comparison, [branch_id], top=2)
+    rows = [line for line in capsys.readouterr().out.splitlines() if line.startswith(f"| {branch_id} ")]
+    assert len(rows) == 1 and rows[0].count("(") == min(2, len(branches) - 1)
+
+# Test Anomaly Detection
+def test_anomaly_detector_flags_mis_keyed_price_and_spike():
+    product = Product('P900', 'Test', 50.0, 'Test')
+    sales = [Sale(f'S{i}', 'B900', product, 2, 100.0, f'2024-06-{i + 1:02d} 09:00:00', 50.0) for i in range(20)]
+    sales.append(Sale('S20', 'B900', product, 2, 10.0, '2024-06-21 09:00:00', 5.0))
+    sales.append(Sale('S21', 'B900', product, 60, 3000.0, '2024-06-22 09:00:00', 50.0))
+    detector = SalesAnomalyDetector()
+    detector.process_sales(sales)
+    detector.flush(final=True)
+    assert [(a['kind'], a['sale_id']) for a in detector.anomalies] == [('price', 'S20'), ('quantity', None)]
+    assert detector.anomalies[1]['value'] == 60
+
+def test_anomaly_detector_closes_finished_days_after_ingest():
+    product = Product('P900', 'Test', 50.0, 'Test')
+    other = Product('P901', 'Other', 50.0, 'Test')
+    sales = [Sale(f'S{i}', 'B900', product, 2, 100.0, f'2024-06-{i + 1:02d} 09:00:00', 50.0) for i in range(20)]
+    sales.append(Sale('S20', 'B900', product, 60, 3000.0, '2024-06-21 09:00:00', 50.0))
+    detector = SalesAnomalyDetector()
+    detector.update({'sales': sales, 'full_reload': True})
+    # The newest day is still open, so a later sale on it is counted once
+    assert detector.anomalies == []
+    detector.update({'sales': [Sale('S21', 'B900', other, 1, 50.0, '2024-06-22 09:00:00', 50.0)], 'full_reload': False})
+    assert [(a['kind'], a['value']) for a in detector.anomalies] == [('quantity', 60)]
+    detector.update({'sales': [], 'full_reload': False})
+    assert len(detector.anomalies) == 1
+
+# Test Demand Forecast
+def test_batched_forecasts_recover_weekly_pattern():
+    pattern = np.array([5.0, 3.0, 3.0, 4.0, 6.0, 9.0, 8.0])
+    matrix = np.tile(pattern, (3, 8)) * np.array([[1.0], [2.0], [0.5]])
+    expected = np.tile(pattern, (3, 1)) * np.array([[1.0], [2.0], [0.5]])
+    for fit in (fit_seasonal_smoothing, fit_linear_trend):
+        result = fit(matrix[:, :49], start_weekday=0, horizon=7)
+        assert result['forecast'] == pytest.approx(expected, abs=1e-6)
+        assert (result['lower'] <= result['forecast']).all() and (result['forecast'] <= result['upper']).all()
+
+def test_demand_forecast_backtest(branches):
+    analysis = DemandForecastAnalysis(branches, model='trend')
+    forecast = analysis.analyze(branch_id='B001')
+    assert forecast['dates'][0] == '2024-07-01'
+    assert forecast['forecast'].shape == (len(forecast['keys']), 7)
+    assert all(branch_id == 'B001' for branch_id, _ in forecast['keys'])
+    report = analysis.backtest(holdout=7)
+    assert report['series'] == len(analysis.keys)
+    assert 0 <= report['coverage'] <= 1 and report['mae'] >= 0
+
+def test_demand_forecast_short_history_falls_back():
+    product = Product('P900', 'Test', 50.0, 'Test')
+    branch = Branch('B900', 'Test', 'Test')
+    branch.sales = [Sale(f'S{i}', 'B900', product, i % 3 + 1, 50.0, f'2024-06-{i + 1:02d} 09:00:00', 50.0) for i in range(10)]
+    analysis = DemandForecastAnalysis([branch])
+    forecast = analysis.analyze()
+    assert forecast['model'] == 'trend' and forecast['forecast'].shape == (1, 7)
+    report = analysis.backtest(holdout=7)
+    assert report['model'] == 'seasonal naive' and report['naive_mae'] == report['mae']
+    with pytest.raises(ValueError):
+        analysis.backtest(holdout=10)
+    with pytest.raises(ValueError):
+        DemandForecastAnalysis([Branch('B901', 'Empty', 'Test')]).analyze()
+
+# Test Ingest Validation
+def test_bad_sales_rows_are_quarantined(tmp_path):
+    for name in ('branches.csv', 'products.csv'):
+        (tmp_path / name).write_text(open(f'data/{name}').read())
+    (tmp_path / 'sales.csv').write_text(
+        'sale_id,branch_id,product_id,quantity,total_price,date,item_price\n'
+        'S1,B001,P001,2,200.0,2024-06-01 08:00:00,100.0\n'
+        'S2,B001,P001,two,200.0,2024-06-01 09:00:00,100.0\n'
+        'S3,B999,P001,1,100.0,2024-06-01 10:00:00,100.0\n'
+        'S4,B001,P999,1,100.0,2024-06-01 11:00:00,100.0\n'
+        'S1,B002,P001,1,100.0,2024-06-01 12:00:00,100.0\n'
+        'S5,B002,P001,1,100.0,2024-06-31 12:00:00,100.0\n'
+        'S6,B002,P001,3,250.0,2024-06-01 13:00:00,100.0\n'
+        'S7,B002,P001,1\n'
+    )
+    db = Database()
+    snapshot = Database.load_data(db, str(tmp_path / 'branches.csv'), str(tmp_path / 'sales.csv'), str(tmp_path / 'products.csv'))
+    assert sorted(sale.sale_id for branch in snapshot.branches for sale in branch.sales) == ['S1', 'S6']
+    assert snapshot.validation['quarantined'] == 6 and snapshot.validation['flagged'] == 1
+
+    with open(tmp_path / 'sales.csv', 'a') as f:
+        f.write('S6,B003,P002,1,200.0,2024-06-02 08:00:00,200.0\nS8,B003,P002,1,200.0,2024-06-02 09:00:00,200.0\n')
+    snapshot = db.load_incremental()
+    assert sorted(sale.sale_id for branch in snapshot.branches for sale in branch.sales) == ['S1', 'S6', 'S8']
+
+    assert save_quarantine(str(tmp_path / 'sales.csv'), snapshot.validation) == str(tmp_path / 'sales_quarantine.csv')
+    with open(tmp_path / 'sales_quarantine.csv') as f:
+        reasons = {row['sale_id']: (row['action'], row['reason']) for row in csv.DictReader(f)}
+    assert reasons['S2'] == ('quarantined', 'invalid quantity')
+    assert reasons['S3'][1] == 'unknown branch_id'
+    assert reasons['S4'][1] == 'unknown product_id'
+    assert reasons['S1'][1] == 'duplicate sale_id'
+    assert reasons['S5'][1] == 'invalid date'
+    assert reasons['S7'][1] == 'expected 7 fields, got 4'
+    assert reasons['S6'] == ('quarantined', 'duplicate sale_id')
+
+# Test Live Dashboard
+def test_dashboard_aggregates_track_latest_day():
+    product = Product('P900', 'Test', 50.0, 'Test')
+    aggregates = DashboardAggregates(['B900', 'B901'])
+    aggregates.process_sales([
+        Sale('S1', 'B900', product, 2, 100.0, '2024-06-01 09:00:00', 50.0),
+        Sale('S2', 'B900', product, 1, 50.0, '2024-06-02 10:00:00', 50.0),
+        Sale('S3', 'B901', product, 3, 150.0, '2024-06-02 10:30:00', 50.0),
+        Sale('S4', 'B900', product, 9, 450.0, '2024-06-01 11:00:00', 50.0)
+    ])
+    assert str(aggregates.day) == '2024-06-02'
+    assert aggregates.branches['B900']['revenue'] == 50.0
+    assert aggregates.branches['B901']['transactions'] == 1
+    assert aggregates.hourly_revenue[10] == 200.0 and sum(aggregates.hourly_revenue) == 200.0
+
+def test_dashboard_redraws_only_changed_cells():
+    product = Product('P900', 'Test', 50.0, 'Test')
+    aggregates = DashboardAggregates(['B900'])
+    aggregates.process(Sale('S1', 'B900', product, 2, 100.0, '2024-06-01 09:00:00', 50.0))
+    output = io.StringIO()
+    view = DashboardView(output)
+    view.draw(aggregates, "status")
+    assert view.draw(aggregates, "status") == 0
+    aggregates.process(Sale('S2', 'B900', product, 1, 50.0, '2024-06-01 15:00:00', 50.0))
+    start = len(output.getvalue())
+    # Revenue, transactions, top products and the 15:00 bar
+    assert view.draw(aggregates, "status") == 4
+    assert "150.00" in output.getvalue()[start:] and "09:00" not in output.getvalue()[start:]
+
 if __name__ == '__main__':
     pytest.main()
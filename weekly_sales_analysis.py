@@ -1,9 +1,12 @@
+import sys
 from abc import ABC, abstractmethod
 from datetime import datetime, timedelta
 from collections import defaultdict
+from itertools import islice
 import matplotlib.pyplot as plt
-from prettytable import PrettyTable
 from database import Database
+from chart_cache import chart_cache, lttb
+from table_renderer import TableRenderer, next_page, settings
 
 # Strategy Pattern for Weekly Sales Analysis
 class WeeklySalesAnalysisStrategy(ABC):
@@ -53,106 +56,130 @@ class WeeklySalesPlotter(WeeklySalesObserver):
         self.plot_sales_analysis(week_labels, total_sales, avg_transaction_values, sales_volumes)
         self.plot_product_sales(weekly_sales)
     
-    def print_tables(self, weekly_sales):
-        for week, data in weekly_sales.items():
-            print(f"\n{'='*40}")
-            print(f"Weekly Sales Report: {week}")
-            print(f"{'='*40}")
-            print(f"Total Sales Amount: {data['total_sales_amount']:.2f} LKR")
-            print(f"Customer Count: {len(data['customer_count'])}")
+    def print_tables(self, weekly_sales, output=None):
+        # Each week is written to the stream as one block; --offset/--limit
+        # select which weeks are shown and --page-size how many weeks make a page
+        output = output or sys.stdout
+        offset = settings['offset'] or 0
+        limit = settings['limit']
+        page_size = settings['page_size']
+        weeks = islice(weekly_sales.items(), offset, offset + limit if limit is not None else None)
+        for count, (week, data) in enumerate(weeks, 1):
             avg_transaction_value = data['total_sales_amount'] / len(data['customer_count']) if data['customer_count'] else 0
-            print(f"Average Transaction Value: {avg_transaction_value:.2f} LKR")
-            print(f"Sales Volume: {data['total_quantity']}")
-            print("\n" + "-"*40)
+            output.write("\n".join([
+                f"\n{'='*40}",
+                f"Weekly Sales Report: {week}",
+                f"{'='*40}",
+                f"Total Sales Amount: {data['total_sales_amount']:.2f} LKR",
+                f"Customer Count: {len(data['customer_count'])}",
+                f"Average Transaction Value: {avg_transaction_value:.2f} LKR",
+                f"Sales Volume: {data['total_quantity']}",
+                "\n" + "-"*40,
+                ""
+            ]))
             
             # Top-Selling Products
             sorted_products = sorted(data['products'].items(), key=lambda x: x[1]['quantity'], reverse=True)
             top_selling_products = sorted_products[:10]
-            print("Top-Selling Products:")
+            output.write("Top-Selling Products:\n")
             self.print_table(
                 headers=["Product ID", "Sales Quantity", "Revenue"],
-                rows=[(pid, info['quantity'], info['revenue']) for pid, info in top_selling_products]
+                rows=[(pid, info['quantity'], info['revenue']) for pid, info in top_selling_products],
+                output=output
             )
             
             # Low-Selling Products
             low_selling_products = sorted_products[-10:]
-            print("\nLow-Selling Products:")
+            output.write("\nLow-Selling Products:\n")
             self.print_table(
                 headers=["Product ID", "Sales Quantity", "Revenue"],
-                rows=[(pid, info['quantity'], info['revenue']) for pid, info in low_selling_products]
+                rows=[(pid, info['quantity'], info['revenue']) for pid, info in low_selling_products],
+                output=output
             )
             
-            print("\n" + "-"*40)
+            output.write("\n" + "-"*40 + "\n")
+            if page_size and count % page_size == 0:
+                output.flush()
+                if not next_page():
+                    break
+        output.flush()
     
-    def print_table(self, headers, rows):
-        table = PrettyTable()
-        table.field_names = headers
-        for row in rows:
-            table.add_row(row)
-        print(table)
+    def print_table(self, headers, rows, output=None):
+        TableRenderer(headers, output=output).render(rows)
 
     def plot_sales_analysis(self, weeks, total_sales, avg_transaction_values, sales_volumes):
-        plt.figure(figsize=(15, 10))
-        
-        plt.subplot(3, 1, 1)
-        plt.plot(weeks, total_sales, marker='o')
-        plt.title('Total Sales Amount Over Time')
-        plt.xlabel('Weeks')
-        plt.ylabel('Total Sales Amount (LKR)')
-        plt.xticks(rotation=45)
-        
-        plt.subplot(3, 1, 2)
-        plt.plot(weeks, avg_transaction_values, marker='o', color='orange')
-        plt.title('Average Transaction Value Over Time')
-        plt.xlabel('Weeks')
-        plt.ylabel('Average Transaction Value (LKR)')
-        plt.xticks(rotation=45)
-        
-        plt.subplot(3, 1, 3)
-        plt.plot(weeks, sales_volumes, marker='o', color='green')
-        plt.title('Sales Volume Over Time')
-        plt.xlabel('Weeks')
-        plt.ylabel('Sales Volume')
-        plt.xticks(rotation=45)
-        
-        plt.tight_layout()
-        plt.show()
+        # Downsample on the total sales curve and keep the same weeks in every panel
+        keep = lttb(range(len(weeks)), total_sales)
+        weeks = [weeks[i] for i in keep]
+        total_sales = [total_sales[i] for i in keep]
+        avg_transaction_values = [avg_transaction_values[i] for i in keep]
+        sales_volumes = [sales_volumes[i] for i in keep]
+
+        def draw():
+            plt.subplot(3, 1, 1)
+            plt.plot(weeks, total_sales, marker='o')
+            plt.title('Total Sales Amount Over Time')
+            plt.xlabel('Weeks')
+            plt.ylabel('Total Sales Amount (LKR)')
+            plt.xticks(rotation=45)
+            
+            plt.subplot(3, 1, 2)
+            plt.plot(weeks, avg_transaction_values, marker='o', color='orange')
+            plt.title('Average Transaction Value Over Time')
+            plt.xlabel('Weeks')
+            plt.ylabel('Average Transaction Value (LKR)')
+            plt.xticks(rotation=45)
+            
+            plt.subplot(3, 1, 3)
+            plt.plot(weeks, sales_volumes, marker='o', color='green')
+            plt.title('Sales Volume Over Time')
+            plt.xlabel('Weeks')
+            plt.ylabel('Sales Volume')
+            plt.xticks(rotation=45)
+            
+            plt.tight_layout()
+
+        data = (weeks, total_sales, avg_transaction_values, sales_volumes)
+        chart_cache.render('weekly_sales_analysis', data, {'figsize': (15, 10)}, draw)
 
     def plot_product_sales(self, weekly_sales):
-        top_selling_products = []
-        low_selling_products = []
+        # Bars for the same product overlap on one category, so only the
+        # tallest one per product is ever visible; draw just that one
+        top_selling_products = {}
+        low_selling_products = {}
         
         for data in weekly_sales.values():
             sorted_products = sorted(data['products'].items(), key=lambda x: x[1]['quantity'], reverse=True)
-            top_selling_products.extend(sorted_products[:10])
-            low_selling_products.extend(sorted_products[-10:])
-        
-        top_product_ids = [pid for pid, info in top_selling_products]
-        top_quantities = [info['quantity'] for pid, info in top_selling_products]
-        top_revenues = [info['revenue'] for pid, info in top_selling_products]
-        
-        low_product_ids = [pid for pid, info in low_selling_products]
-        low_quantities = [info['quantity'] for pid, info in low_selling_products]
-        low_revenues = [info['revenue'] for pid, info in low_selling_products]
-        
-        plt.figure(figsize=(15, 10))
+            for pid, info in sorted_products[:10]:
+                top_selling_products[pid] = max(top_selling_products.get(pid, 0), info['quantity'])
+            for pid, info in sorted_products[-10:]:
+                low_selling_products[pid] = max(low_selling_products.get(pid, 0), info['quantity'])
         
-        plt.subplot(2, 1, 1)
-        plt.bar(top_product_ids, top_quantities)
-        plt.title('Top-Selling Products (Quantity)')
-        plt.xlabel('Product ID')
-        plt.ylabel('Quantity Sold')
-        plt.xticks(rotation=45)
+        top_product_ids = list(top_selling_products)
+        top_quantities = list(top_selling_products.values())
         
-        plt.subplot(2, 1, 2)
-        plt.bar(low_product_ids, low_quantities, color='red')
-        plt.title('Low-Selling Products (Quantity)')
-        plt.xlabel('Product ID')
-        plt.ylabel('Quantity Sold')
-        plt.xticks(rotation=45)
+        low_product_ids = list(low_selling_products)
+        low_quantities = list(low_selling_products.values())
         
-        plt.tight_layout()
-        plt.show()
+        def draw():
+            plt.subplot(2, 1, 1)
+            plt.bar(top_product_ids, top_quantities)
+            plt.title('Top-Selling Products (Quantity)')
+            plt.xlabel('Product ID')
+            plt.ylabel('Quantity Sold')
+            plt.xticks(rotation=45)
+            
+            plt.subplot(2, 1, 2)
+            plt.bar(low_product_ids, low_quantities, color='red')
+            plt.title('Low-Selling Products (Quantity)')
+            plt.xlabel('Product ID')
+            plt.ylabel('Quantity Sold')
+            plt.xticks(rotation=45)
+            
+            plt.tight_layout()
+
+        data = (top_product_ids, top_quantities, low_product_ids, low_quantities)
+        chart_cache.render('weekly_product_sales', data, {'figsize': (15, 10)}, draw)
 
 # Notifier Class
 class SalesNotifier: